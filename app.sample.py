@@ -16,7 +16,7 @@ import plex
 import plex_update_metamedia
 import plex_rematch
 import kavita
-from helpers import mem_usage
+from helpers import mem_usage, close_sessions
 
 logger = logging.getLogger(__name__)
 
@@ -58,11 +58,17 @@ async def main(*args: Any, **kwds: Any) -> None:
     """
     #query = f"SELECT * FROM metadata_items WHERE guid LIKE '%sjva_agent://%' AND metadata_type = 1 LIMIT 10;"
     #await plex_rematch.main_(query)
+    # 처리 결과는 저널(plex_journal.db)에 기록되며 rerun=True 이면 이미 처리된 항목은 건너 뜀
+    #await plex_rematch.main_(query, rerun=True)
+    # 일치하는 검색 결과가 없었던 항목 조회
+    #for row in plex_rematch.get_no_matches():
+    #    print(row['metadata_id'], row['old_guid'], row['agent'])
 
     """
     Plex 일치항목 강제 수정
     기본 에이전트로 설정된 라이브러리에서 타 에이전트로 강제 매칭을 시도
     매칭 후 메타데이터 새로고침을 하면 원래 에이전트의 데이터로 복구 됨
+    여러 섹션의 메타데이터를 한번에 지정 가능
     """
     #await plex_rematch.force_match_with_agent([104435, 120317], 'com.plexapp.agents.sjva_agent_movie')
 
@@ -82,6 +88,16 @@ async def main(*args: Any, **kwds: Any) -> None:
     모든 섹션을 지정하려면 -1 입력"""
     #await plex.prune_directories(1, '/mnt/cloud/gds/GDRIVE/VIDEO/방송중', dry_run=True, print_exists=False)
 
+    """
+    Plex 휴지통 처리 (드라이브 목록 사용)
+    마운트 경로를 확인하는 대신 구글 드라이브의 폴더 목록으로 파일 존재 여부를 확인
+    플렉스의 경로를 mappings로 드라이브 경로로 바꾸고, 드라이브 경로의 폴더 ID는 google 설정의 roots에서 찾음
+    roots에서 찾을 수 없는 경로가 있으면 삭제하지 않고 중단"""
+    #from google_drive import DriveListing
+    #listing = DriveListing(mappings=plex.config.mappings)
+    #await plex.delete_not_exists(12, '/mnt/cloud/gds/GDRIVE/VIDEO/방송중', dry_run=True, exists=listing.exists)
+    #await plex.prune_directories(1, '/mnt/cloud/gds/GDRIVE/VIDEO/방송중', dry_run=True, exists=listing.exists)
+
     """
     Plex 색인 정리
     라이브러리 색인 목록의 음절을 자음으로 수정
@@ -157,6 +173,31 @@ async def main(*args: Any, **kwds: Any) -> None:
     #result = google_drive.get_file(file['id'])
     #print(result)
 
+    """
+    Google Drive 비동기 조회
+    google 세션을 따로 사용해서 이벤트 루프를 막지 않고 플렉스, 카비타 요청에 영향을 주지 않음"""
+    #from google_drive import async_google_drive
+    #async for file in async_google_drive.list_files("name contains '런닝맨'"):
+    #    print(file)
+    #paths = await async_google_drive.get_full_paths(['1aBcD...', '1eFgH...'])
+    #print(paths)
+
+    """
+    Google Drive 활동 감시
+    감시 폴더의 새 활동을 주기적으로 조회해서 변경된 폴더만 플렉스, 카비타에서 스캔
+    감시 폴더는 '폴더ID#경로' 형식이고 경로는 각 앱의 mappings 설정으로 로컬 경로로 변환
+    조회 상태는 google_activity.db에 저장되어 다시 실행하면 이어서 처리"""
+    #from google_activity import watch_activity
+    #await watch_activity(['0AbCdEf...#/GDRIVE'], targets=('plex', 'kavita'), interval=60, dry_run=True)
+    # 로컬 대역 서버로 점검: 요청 주소와 token_uri를 대역 서버로 지정하고 별도의 상태 파일로 한 번만 조회
+    #from google_drive import AsyncGoogleDrive
+    #from google_activity import ActivityPoller
+    #drive = AsyncGoogleDrive({**config.google.token, 'token_uri': 'http://127.0.0.1:8080/token'})
+    #drive.ACTIVITY_URL = 'http://127.0.0.1:8080/v2'
+    #drive.BATCH_URL = 'http://127.0.0.1:8080/batch/drive/v3'
+    #poller = ActivityPoller(['0AbCdEf...#/GDRIVE'], state='/tmp/activity_check.db', query=drive.query_activity, resolve=drive.get_full_paths, dry_run=True)
+    #print(await poller.poll())
+
     """
     Kavita 커버 파일 분산
     covers 폴더 하나에 너무 많은 커버 이미지 파일이 집중되는 것을 방지하기 위해서
@@ -186,6 +227,13 @@ async def main(*args: Any, **kwds: Any) -> None:
     예) 새로 생성된 커버 파일은 기본 로컬 경로(covers)에 저장, 이후 스크립트로 정리하면서 리모트(sub_path)로 이동"""
     #kavita.organize_covers('/kavita/config/covers', quantity=10, sub_path='sub_path', dry_run=True)
 
+    """
+    Kavita 커버 파일 분산 중 중단된 작업 복구
+    이동 내역은 저널(kavita_journal.db)에 기록되며 DB 업데이트가 완료되지 않은 이동을 처리
+    replay: 이동이 끝난 파일의 DB 업데이트를 적용, rollback: 이동이 끝난 파일을 원래 위치로 되돌림
+    DB를 직접 수정해야 하기 때문에 Kavita 서버를 종료 후 실행"""
+    #kavita.recover_organized_covers('replay', dry_run=True)
+
     """
     Kavita 커버 파일은 이동 되었는데 DB 업데이트가 안됐을 경우 실행
     DB를 직접 수정해야 하기 때문에 Kavita 서버를 종료 후 실행
@@ -199,7 +247,7 @@ async def main(*args: Any, **kwds: Any) -> None:
     DB를 직접 수정해야 하기 때문에 Kavita 서버를 종료 후 실행
     covers 경로는 스크립트가 접근 가능한 경로
     라이브러리 ID를 여러 개 지정"""
-    #kavita.undo_organized_covers([101], '/kavita/config/covers')
+    #kavita.undo_organized_covers([101], '/kavita/config/covers', dry_run=True)
 
     """
     Kavita 커버 파일 정리
@@ -263,9 +311,17 @@ async def main(*args: Any, **kwds: Any) -> None:
     #print(cs.fetchone())
 
 
+async def run(*args: Any, **kwds: Any) -> None:
+    try:
+        await main(*args, **kwds)
+    finally:
+        # 앱별 HTTP 세션 정리
+        await close_sessions()
+
+
 if __name__ == "__main__":
     start_mem = mem_usage()
     start_time = time.time()
-    asyncio.run(main())
+    asyncio.run(run())
     logger.debug(f"메모리 변동: {mem_usage() - start_mem:.3f}MB")
     logger.debug(f"걸린 시간: {time.time() - start_time:.3f}s")
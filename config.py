@@ -61,10 +61,13 @@ class _BaseConfig:
     dry_run: bool = True
     workers: int = 2
     batch_size: int = 100
+    page_size: int = 1000
+    queue_size: int = 100
     retry: int = 10
     countdown: int = 5
     mappings: Mapping[str, str] = dataclasses.field(default_factory=dict)
     headers: Mapping[str, str] = dataclasses.field(default_factory=get_default_headers)
+    session: Mapping[str, int | float] = dataclasses.field(default_factory=dict)
 
     def map_path(self, target: str) -> str:
         for old, new in self.mappings.items():
@@ -89,10 +92,12 @@ class _PlexConfig:
     title_match_ratio: float = 0.7
     margin_of_year: int = 1000
     extra_agents: Mapping[int, str] = dataclasses.field(default_factory=get_default_extra_agents)
+    speculative: bool = False
     db: str = None
     metadata: str = None
     media: str = None
     sqlite: str = None
+    journal: str = None
     metadata_url_columns: Sequence[str] = ('user_thumb_url', 'user_art_url', 'user_banner_url', 'user_music_url', 'user_clear_logo_url')
     media_types: Mapping[int, str] = dataclasses.field(default_factory=get_default_media_types)
 
@@ -116,6 +121,8 @@ class PlexConfig(_BaseConfig, _PlexConfig):
             self.media = f'{self.support}/Media'
         if not self.sqlite:
             self.sqlite = f'{self.application}/Plex SQLite'
+        if not self.journal:
+            self.journal = str(pathlib.Path(__file__).with_name('plex_journal.db'))
 
 
 @dataclasses.dataclass
@@ -134,6 +141,7 @@ class _KavitaConfig:
         'AppUserCollection',
     )
     plugin_name: str = 'flaskfarm-tools'
+    journal: str = None
 
 
 @dataclasses.dataclass
@@ -145,6 +153,8 @@ class KavitaConfig(_BaseConfig, _KavitaConfig):
             self.ignore_cover_patterns = tuple(re.compile(pattern) for pattern in self.ignore_cover_patterns)
         else:
             self.ignore_cover_patterns = ()
+        if not self.journal:
+            self.journal = str(pathlib.Path(__file__).with_name('kavita_journal.db'))
 
 
 @dataclasses.dataclass
@@ -154,6 +164,10 @@ class _GoogleConfig:
     cache_enable: bool = False
     cache_ttl: int = 300
     cache_maxsize: int = 256
+    folder_cache: str = None
+    folder_cache_ttl: int = 86400
+    activity_state: str = None
+    roots: Mapping[str, str] = dataclasses.field(default_factory=dict)
 
 
 @dataclasses.dataclass
@@ -172,6 +186,10 @@ class GoogleConfig(_BaseConfig, _GoogleConfig):
             raise Exception('token 값이 없습니다.')
         if not self.token.get('client_id') or not self.token.get('client_secret') or not self.token.get('refresh_token'):
             raise Exception('client_id, client_secret, refresh_token 값을 확인해 주세요.')
+        if not self.folder_cache:
+            self.folder_cache = str(pathlib.Path(__file__).with_name('google_folders.db'))
+        if not self.activity_state:
+            self.activity_state = str(pathlib.Path(__file__).with_name('google_activity.db'))
 
 
 yaml_config = None
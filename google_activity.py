@@ -0,0 +1,320 @@
+import time
+import asyncio
+import sqlite3
+import logging
+import datetime
+import pathlib
+import contextlib
+from typing import Any, Awaitable, Callable, Iterable, Sequence
+
+from config import google as config
+from helpers import dict_factory
+from google_drive import async_google_drive, FOLDER_MIME_TYPE
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityState:
+    """
+    드라이브 활동 조회 상태를 SQLite 파일에 저장
+
+    감시 폴더마다 마지막으로 처리한 활동 시각, 진행 중인 조회의 page token, 아직 스캔하지 않은 폴더를 기록해서
+    중간에 종료되어도 이어서 처리할 수 있도록 함.
+    """
+
+    def __init__(self, database: str = config.activity_state) -> None:
+        self.database = database
+        with self.connect() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS cursors (ancestor TEXT PRIMARY KEY, since INTEGER NOT NULL, latest INTEGER NOT NULL, page_token TEXT)')
+            con.execute('CREATE TABLE IF NOT EXISTS pending (ancestor TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (ancestor, path))')
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterable[sqlite3.Connection]:
+        con = sqlite3.connect(self.database, timeout=30)
+        con.row_factory = dict_factory
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get_cursor(self, ancestor: str, since: int) -> dict:
+        with self.connect() as con:
+            row = con.execute('SELECT * FROM cursors WHERE ancestor = ?', (ancestor,)).fetchone()
+            if not row:
+                row = {'ancestor': ancestor, 'since': since, 'latest': since, 'page_token': None}
+                con.execute('INSERT INTO cursors (ancestor, since, latest, page_token) VALUES (:ancestor, :since, :latest, :page_token)', row)
+            return row
+
+    def save_page(self, ancestor: str, latest: int, page_token: str | None, paths: Iterable[str]) -> None:
+        # 페이지에서 찾은 폴더와 다음 page token을 한 트랜잭션으로 기록
+        with self.connect() as con:
+            con.executemany('INSERT OR IGNORE INTO pending (ancestor, path) VALUES (?, ?)', ((ancestor, path) for path in paths))
+            con.execute('UPDATE cursors SET latest = MAX(latest, ?), page_token = ? WHERE ancestor = ?', (latest, page_token, ancestor))
+
+    def get_pending(self, ancestor: str) -> list[str]:
+        with self.connect() as con:
+            return [row['path'] for row in con.execute('SELECT path FROM pending WHERE ancestor = ?', (ancestor,))]
+
+    def complete(self, ancestor: str) -> None:
+        with self.connect() as con:
+            con.execute('DELETE FROM pending WHERE ancestor = ?', (ancestor,))
+            con.execute('UPDATE cursors SET since = latest, page_token = NULL WHERE ancestor = ?', (ancestor,))
+
+
+def get_activity_time(activity: dict) -> int:
+    """
+    활동 시각을 epoch 밀리초로 반환
+    """
+    value = activity.get('timestamp') or (activity.get('timeRange') or {}).get('endTime')
+    if not value:
+        return 0
+    return int(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+
+
+def get_item_id(target: dict) -> str | None:
+    name = (target.get('driveItem') or {}).get('name') or ''
+    return name.removeprefix('items/') or None
+
+
+def is_folder(drive_item: dict) -> bool:
+    return 'driveFolder' in drive_item or 'folder' in drive_item or drive_item.get('mimeType') == FOLDER_MIME_TYPE
+
+
+def get_changed_items(activity: dict) -> dict[str, bool]:
+    """
+    활동에서 변경된 항목을 추출
+
+    Args:
+        activity: activity:query 결과의 활동
+
+    Returns:
+        `{항목 ID: 폴더 여부}`. 이동한 항목의 이전, 이후 상위 폴더도 포함
+    """
+    items = {}
+    for target in activity.get('targets') or ():
+        drive_item = target.get('driveItem') or {}
+        if item_id := get_item_id(target):
+            items[item_id] = is_folder(drive_item)
+    move = (activity.get('primaryActionDetail') or {}).get('move') or {}
+    for parent in (*(move.get('addedParents') or ()), *(move.get('removedParents') or ())):
+        if item_id := get_item_id(parent):
+            items[item_id] = True
+    return items
+
+
+def get_ancestor_root(ancestor: str) -> str:
+    """
+    감시 폴더의 드라이브 경로. `폴더ID#경로` 형식이 아니면 `/폴더ID`
+
+    Examples:
+        >>> get_ancestor_root('0AbCdEf...#/GDRIVE')
+        '/GDRIVE'
+    """
+    ancestor_id, _, root = ancestor.partition('#')
+    return root or f'/{ancestor_id}'
+
+
+def is_under_root(path: str, root: str) -> bool:
+    """
+    절대 경로이면서 root 또는 그 하위 경로인지 여부
+
+    Examples:
+        >>> is_under_root('/GDRIVE/A', '/GDRIVE'), is_under_root('.', '/GDRIVE'), is_under_root('A', '/GDRIVE')
+        (True, False, False)
+    """
+    path = pathlib.PurePosixPath(path)
+    root = pathlib.PurePosixPath(root)
+    return path.is_absolute() and (path == root or root in path.parents)
+
+
+def coalesce_paths(paths: Iterable[str]) -> list[str]:
+    """
+    상위 폴더가 함께 있는 경로를 제외
+
+    Examples:
+        >>> coalesce_paths(['/GDRIVE/A', '/GDRIVE/A/B', '/GDRIVE/C'])
+        ['/GDRIVE/A', '/GDRIVE/C']
+    """
+    kept = []
+    for path in sorted(set(pathlib.PurePosixPath(path) for path in paths), key=lambda path: len(path.parts)):
+        if not any(path == parent or parent in path.parents for parent in kept):
+            kept.append(path)
+    return [str(path) for path in kept]
+
+
+async def scan_plex(paths: Sequence[str], dry_run: bool = config.dry_run) -> None:
+    import plex
+    roots = [
+        (pathlib.PurePosixPath(root_path), section['id'])
+        for section in plex.sections.all()
+        for root_path in section['root_paths']
+    ]
+    for path in paths:
+        local = pathlib.PurePosixPath(plex.config.map_path(path))
+        matches = [(root, section_id) for root, section_id in roots if local == root or root in local.parents]
+        if not matches:
+            logger.warning(f'플렉스 섹션을 찾을 수 없음: {local}')
+            continue
+        # 가장 깊은 루트 경로의 섹션
+        section_id = max(matches, key=lambda match: len(match[0].parts))[1]
+        logger.info(f'플렉스 스캔: {section_id=} {local}')
+        if not dry_run:
+            result = await plex.scan(section_id, str(local))
+            if not 300 > (result.get('status_code') or 0) > 199:
+                logger.error(f'플렉스 스캔 실패: {local} status_code={result.get("status_code")}')
+
+
+async def scan_kavita(paths: Sequence[str], dry_run: bool = config.dry_run) -> None:
+    import kavita
+    for path in paths:
+        local = kavita.config.map_path(path)
+        logger.info(f'카비타 스캔: {local}')
+        if not dry_run:
+            result = await kavita.scan_folder(local)
+            if not 300 > (result.get('status_code') or 0) > 199:
+                logger.error(f'카비타 스캔 실패: {local} status_code={result.get("status_code")}')
+
+
+SCANNERS = {
+    'plex': scan_plex,
+    'kavita': scan_kavita,
+}
+
+
+class ActivityPoller:
+    """
+    드라이브 활동을 주기적으로 조회해서 변경된 폴더만 플렉스, 카비타에서 스캔
+
+    활동 항목을 `get_full_paths()`로 드라이브 경로로 바꾼 뒤 폴더 단위로 모으고,
+    각 앱의 `map_path()`로 로컬 경로로 바꿔서 스캔을 요청함.
+    """
+
+    def __init__(self,
+                 ancestors: Sequence[str],
+                 targets: Sequence[str] = ('plex',),
+                 state: ActivityState | str = config.activity_state,
+                 query: Callable[[dict], Awaitable[dict]] = None,
+                 resolve: Callable[[Sequence[str], str], Awaitable[dict]] = None,
+                 scanners: dict[str, Callable[[Sequence[str], bool], Awaitable[None]]] = None,
+                 page_size: int = 100,
+                 lookback: int = 3600,
+                 dry_run: bool = config.dry_run) -> None:
+        """
+        Args:
+            ancestors: 감시할 폴더. `폴더ID#경로` 형식이면 해당 폴더를 지정한 경로로 표시
+            targets: 스캔할 앱. `plex`, `kavita`
+            state: 조회 상태를 저장할 파일 경로 또는 ActivityState
+            query: activity:query 요청 코루틴. 기본값: `async_google_drive.query_activity`
+            resolve: 항목 ID 목록과 ancestor로 경로를 조회하는 코루틴. 기본값: `async_google_drive.get_full_paths`
+            scanners: 앱별 스캔 코루틴. 기본값: `SCANNERS`
+            page_size: 활동 조회 페이지 크기
+            lookback: 처음 실행할 때 조회할 과거 시간 (초)
+            dry_run: 스캔 요청 여부
+        """
+        self.ancestors = tuple(ancestors)
+        for ancestor in self.ancestors:
+            if '#' not in ancestor:
+                logger.warning(f'감시 폴더의 경로가 없습니다. 드라이브 경로가 /{ancestor}로 시작하지 않는 항목은 스캔하지 않습니다: {ancestor}')
+        self.targets = tuple(targets)
+        self.state = state if isinstance(state, ActivityState) else ActivityState(state)
+        self.query = query or async_google_drive.query_activity
+        self.resolve = resolve or async_google_drive.get_full_paths
+        self.scanners = scanners or SCANNERS
+        self.page_size = page_size
+        self.lookback = lookback
+        self.dry_run = dry_run
+
+    async def collect(self, ancestor: str) -> None:
+        ancestor_id = ancestor.partition('#')[0]
+        root = get_ancestor_root(ancestor)
+        cursor = self.state.get_cursor(ancestor, int((time.time() - self.lookback) * 1000))
+        page_token = cursor['page_token']
+        while True:
+            body = {
+                'ancestorName': f'items/{ancestor_id}',
+                'filter': f'time > {cursor["since"]}',
+                'pageSize': self.page_size,
+            }
+            if page_token:
+                body['pageToken'] = page_token
+            page = await self.query(body)
+            activities = page.get('activities') or ()
+            items = {}
+            latest = cursor['since']
+            for activity in activities:
+                items.update(get_changed_items(activity))
+                latest = max(latest, get_activity_time(activity))
+            # 완전히 삭제되는 등 조회하지 못한 항목은 resolve 결과에 없음
+            paths = await self.resolve(tuple(items), ancestor) if items else {}
+            folders = []
+            for item_id, (full_path, _, _) in paths.items():
+                folder = full_path if items[item_id] else str(pathlib.PurePosixPath(full_path).parent)
+                if not is_under_root(folder, root):
+                    # 상위 폴더를 조회하지 못했거나 감시 폴더 밖으로 이동한 항목
+                    logger.debug(f'감시 폴더 밖의 경로: {item_id} {full_path}')
+                    continue
+                folders.append(folder)
+            page_token = page.get('nextPageToken')
+            self.state.save_page(ancestor, latest, page_token, folders)
+            logger.debug(f'활동 조회: {ancestor_id} 활동={len(activities)} 폴더={len(folders)}')
+            if not page_token:
+                break
+
+    async def poll(self) -> list[str]:
+        """
+        감시 폴더마다 새 활동을 조회하고 변경된 폴더를 스캔
+
+        Returns:
+            스캔한 드라이브 경로 목록
+        """
+        scanned = []
+        for ancestor in self.ancestors:
+            try:
+                await self.collect(ancestor)
+            except Exception as e:
+                logger.exception(f'활동 조회 실패: {ancestor} {e}')
+                continue
+            paths = coalesce_paths(self.state.get_pending(ancestor))
+            failed = False
+            for target in self.targets:
+                try:
+                    await self.scanners[target](paths, dry_run=self.dry_run)
+                except Exception as e:
+                    # 스캔하지 못한 폴더는 pending에 남겨서 다음 조회 때 다시 스캔
+                    logger.exception(f'스캔 실패: {target} {ancestor} {e}')
+                    failed = True
+            if failed:
+                continue
+            scanned.extend(paths)
+            if self.dry_run:
+                # 실제로 스캔할 때까지 pending과 조회 시각을 유지
+                continue
+            self.state.complete(ancestor)
+        return scanned
+
+    async def run(self, interval: int | float = 60) -> None:
+        while True:
+            try:
+                paths = await self.poll()
+                if paths:
+                    logger.info(f'변경된 폴더 스캔: {len(paths)}')
+            except Exception as e:
+                logger.exception(f'활동 감시 오류: {e}')
+            await asyncio.sleep(interval)
+
+
+async def watch_activity(ancestors: Sequence[str], targets: Sequence[str] = ('plex',), interval: int | float = 60, dry_run: bool = config.dry_run, **kwds: Any) -> None:
+    """
+    드라이브 활동을 감시하면서 변경된 폴더만 스캔
+
+    Args:
+        ancestors: 감시할 폴더. `폴더ID#경로` 형식
+        targets: 스캔할 앱. `plex`, `kavita`
+        interval: 조회 간격 (초)
+        dry_run: 스캔 요청 여부
+
+    Examples:
+        >>> await watch_activity(['0AbCdEf...#/GDRIVE'], targets=('plex', 'kavita'), interval=60, dry_run=True)
+    """
+    await ActivityPoller(ancestors, targets=targets, dry_run=dry_run, **kwds).run(interval)
@@ -1,15 +1,25 @@
+import json
 import time
 import html
+import uuid
+import asyncio
+import sqlite3
 import pathlib
 import logging
+import threading
 import traceback
-from typing import Any
+import contextlib
+import unicodedata
+import urllib.parse
+import concurrent.futures
+from typing import Any, Callable, Iterable, Generator, AsyncGenerator, Sequence, Mapping
 
-from helpers import apply_cache, get_ttl_hash, check_packages
+from helpers import ttl_cache, check_packages, dict_factory, get_session, sessions, request_api, request_with_retry, RetryPolicy, DEFAULT_RETRY
 from config import google as config
 
 check_packages((('httplib2', 'httplib2'), ('google_auth_httplib2', 'google-auth-httplib2'), ('google-api-python-client', 'google-api-python-client')))
 
+import aiohttp
 from httplib2 import Http
 from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2 import credentials
@@ -19,6 +29,136 @@ from googleapiclient import errors
 
 logger = logging.getLogger(__name__)
 
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+SHORTCUT_MIME_TYPE = 'application/vnd.google-apps.shortcut'
+FOLDER_FIELDS = 'id, name, parents, mimeType'
+
+
+class FolderCache:
+    """
+    구글 드라이브 폴더 정보를 SQLite 파일에 저장
+
+    경로를 조회할 때마다 같은 상위 폴더를 API로 다시 요청하지 않도록 id, 이름, 상위 폴더를 기록해 둠.
+    `ttl` 초가 지난 정보는 다시 요청함.
+    """
+
+    def __init__(self, database: str, ttl: int = 86400) -> None:
+        """
+        Args:
+            database: 캐시 파일 경로
+            ttl: 캐시 유효 시간 (초). 0 이하면 캐시를 사용하지 않음
+        """
+        self.database = database
+        self.ttl = ttl
+        with self.connect() as con:
+            con.execute(
+                'CREATE TABLE IF NOT EXISTS folders ('
+                'id TEXT PRIMARY KEY, name TEXT, parent TEXT, mime_type TEXT, fetched_at REAL NOT NULL)'
+            )
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterable[sqlite3.Connection]:
+        # 여러 스레드에서 사용할 수 있도록 매번 연결을 새로 열고 닫음
+        con = sqlite3.connect(self.database, timeout=30)
+        con.row_factory = dict_factory
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get_many(self, item_ids: Iterable[str]) -> dict[str, dict]:
+        """
+        캐시에 있는 폴더 정보를 반환
+
+        Args:
+            item_ids: 폴더 ID 목록
+
+        Returns:
+            `{id: files().get() 형식의 폴더 정보}`. 캐시에 없거나 만료된 ID는 포함하지 않음
+        """
+        item_ids = tuple(set(item_ids))
+        if self.ttl <= 0 or not item_ids:
+            return {}
+        folders = {}
+        expired_before = time.time() - self.ttl
+        with self.connect() as con:
+            for idx in range(0, len(item_ids), 500):
+                chunk = item_ids[idx:idx + 500]
+                query = f'SELECT * FROM folders WHERE fetched_at > ? AND id IN ({", ".join("?" * len(chunk))})'
+                for row in con.execute(query, (expired_before, *chunk)):
+                    folders[row['id']] = {
+                        'id': row['id'],
+                        'name': row['name'],
+                        'parents': [row['parent']] if row['parent'] else [],
+                        'mimeType': row['mime_type'],
+                    }
+        return folders
+
+    def get(self, item_id: str) -> dict | None:
+        return self.get_many((item_id,)).get(item_id)
+
+    def put_many(self, files: Iterable[dict]) -> None:
+        """
+        폴더 정보를 저장. 조회에 실패해서 이름이 없는 정보와 폴더가 아닌 항목은 저장하지 않음
+
+        Args:
+            files: files().get() 형식의 정보 목록
+        """
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        rows = [
+            (file['id'], file['name'], (file.get('parents') or [None])[0], file.get('mimeType'), now)
+            for file in files
+            if file.get('name') and file.get('mimeType', FOLDER_MIME_TYPE) == FOLDER_MIME_TYPE
+        ]
+        if not rows:
+            return
+        with self.connect() as con:
+            con.executemany('INSERT OR REPLACE INTO folders (id, name, parent, mime_type, fetched_at) VALUES (?, ?, ?, ?, ?)', rows)
+
+    def put(self, file: dict) -> None:
+        self.put_many((file,))
+
+    def invalidate(self, item_ids: Iterable[str] = None) -> None:
+        """
+        캐시를 삭제
+
+        Args:
+            item_ids: 삭제할 폴더 ID 목록. `None`이면 모두 삭제
+        """
+        with self.connect() as con:
+            if item_ids is None:
+                con.execute('DELETE FROM folders')
+            else:
+                con.executemany('DELETE FROM folders WHERE id = ?', ((item_id,) for item_id in item_ids))
+
+    def purge(self) -> int:
+        """
+        만료된 캐시를 삭제하고 삭제한 개수를 반환
+        """
+        with self.connect() as con:
+            return con.execute('DELETE FROM folders WHERE fetched_at <= ?', (time.time() - self.ttl,)).rowcount
+
+
+class LockedCredentials(credentials.Credentials):
+    """
+    여러 스레드가 동시에 토큰을 갱신하지 않도록 잠금을 사용하는 인증 정보
+    """
+
+    def __init__(self, *args: Any, **kwds: Any) -> None:
+        super().__init__(*args, **kwds)
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, request: Any) -> None:
+        token = self.token
+        with self._refresh_lock:
+            # 기다리는 동안 다른 스레드가 갱신했으면 그 토큰을 사용
+            if self.token != token and self.valid:
+                return
+            super().refresh(request)
+
 
 class GoogleDrive:
 
@@ -31,10 +171,11 @@ class GoogleDrive:
     _cache_ttl = 600 # seconds
     _cache_maxsize = 64 # each
 
-    def __init__(self, token: dict, scopes: tuple, cache_enable: bool = False, cache_maxsize: int = 64, cache_ttl: int = 600):
+    def __init__(self, token: dict, scopes: tuple, cache_enable: bool = False, cache_maxsize: int = 64, cache_ttl: int = 600, folder_cache: str = None, folder_cache_ttl: int = 86400):
         self._token = token
         self._scopes = scopes
-        self._credentials: credentials.Credentials = credentials.Credentials.from_authorized_user_info(self.token, self.scopes)
+        self._credentials: credentials.Credentials = LockedCredentials.from_authorized_user_info(self.token, self.scopes)
+        self._local = threading.local()
         self._cache_enable = cache_enable
         self._cache_ttl = cache_ttl
         self._cache_maxsize = cache_maxsize
@@ -42,7 +183,9 @@ class GoogleDrive:
         self._api_drive: Resource = build('drive', 'v3', requestBuilder=self.build_google_request, http=authorized_http)
         self._api_activity: Resource = build('driveactivity', 'v2', requestBuilder=self.build_google_request, http=authorized_http)
         if self.cache_enable:
-            self.get_file = apply_cache(self.get_file, self.cache_maxsize)
+            # 조회에 실패한 결과는 저장하지 않음
+            self.get_file = ttl_cache(self.cache_maxsize, self.cache_ttl, cacheable=lambda file: 'name' in file)(self.get_file)
+        self.folders = FolderCache(folder_cache, folder_cache_ttl) if folder_cache else None
 
     @property
     def token(self) -> str:
@@ -55,7 +198,7 @@ class GoogleDrive:
     @property
     def credentials(self) -> credentials.Credentials:
         return self._credentials
-    
+
     @property
     def cache_enable(self) -> bool:
         return self._cache_enable
@@ -76,17 +219,53 @@ class GoogleDrive:
     def api_activity(self) -> Resource:
         return self._api_activity
 
+    def get_http(self) -> AuthorizedHttp:
+        """
+        현재 스레드의 AuthorizedHttp를 반환
+
+        httplib2.Http는 스레드에 안전하지 않으므로 스레드마다 하나씩 만들어서 연결을 재사용함.
+        인증 정보는 모든 스레드가 공유함.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.credentials, http=Http())
+        return http
+
     def build_google_request(self, http: AuthorizedHttp, *args: Any, **kwargs: Any):
         # https://googleapis.github.io/google-api-python-client/docs/thread_safety.html
-        new_http = AuthorizedHttp(self.credentials, http=Http())
-        return HttpRequest(new_http, *args, **kwargs)
+        return HttpRequest(self.get_http(), *args, **kwargs)
 
-    def get_full_path(self, item_id: str, ancestor: str = '') -> tuple[str, tuple[str, str], str]:
-        if not item_id:
-            raise Exception(f'ID를 확인하세요: "{item_id}"')
+    def get_folder(self, item_id: str) -> dict:
+        """
+        폴더 정보를 폴더 캐시에서 찾고 없으면 API로 요청
+
+        Args:
+            item_id: 폴더 ID
+
+        Returns:
+            files().get() 형식의 폴더 정보
+        """
+        if self.folders and (folder := self.folders.get(item_id)):
+            return folder
+        folder = self.get_file(item_id, fields=FOLDER_FIELDS)
+        if self.folders:
+            self.folders.put(folder)
+        return folder
+
+    def invalidate_folders(self, item_ids: Iterable[str] = None) -> None:
+        """
+        폴더 캐시를 삭제. 폴더를 옮기거나 이름을 바꿨을 때 사용
+
+        Args:
+            item_ids: 삭제할 폴더 ID 목록. `None`이면 모두 삭제
+        """
+        if self.folders:
+            self.folders.invalidate(item_ids)
+
+    @staticmethod
+    def build_full_path(file: dict, get_parent: Callable[[str], dict], ancestor: str = '') -> tuple[str, tuple[str, str], str]:
+        item_id = file.get('id')
         ancestor_id, _, root = ancestor.partition('#')
-        # do not use cache
-        file = self.get_file(item_id, ttl_hash=time.time())
         web_view = file.get('webViewLink')
         if root and item_id == ancestor_id:
             current_path = [(root, ancestor_id)]
@@ -94,8 +273,7 @@ class GoogleDrive:
             current_path = [(file.get('name'), file.get('id'))]
             break_counter = 100
             while file.get('parents') and break_counter > 0:
-                ttl_hash = get_ttl_hash(self.cache_ttl) if self.cache_enable else time.time()
-                file = self.get_file(file.get('parents')[0], ttl_hash=ttl_hash)
+                file = get_parent(file.get('parents')[0])
                 if root and file.get('id') == ancestor_id:
                     current_path.append((root, ancestor_id))
                     break
@@ -106,11 +284,115 @@ class GoogleDrive:
             current_path[-1] = (f'/{current_path[-1][1]}', current_path[-1][1])
         full_path = pathlib.Path(*[p[0] for p in current_path[::-1] if p[0]])
         parent = current_path[1] if len(current_path) > 1 else current_path[0]
+        return str(full_path), parent, web_view
+
+    def get_full_path(self, item_id: str, ancestor: str = '') -> tuple[str, tuple[str, str], str]:
+        if not item_id:
+            raise Exception(f'ID를 확인하세요: "{item_id}"')
+        # do not use cache
+        get_file = self.get_file.__wrapped__ if self.cache_enable else self.get_file
+        file = get_file(item_id)
+        if self.folders:
+            self.folders.put(file)
+        result = self.build_full_path(file, self.get_folder, ancestor)
         if self.cache_enable:
             logger.debug(self.get_file.cache_info())
-        return str(full_path), parent, web_view
+        return result
+
+    def get_full_paths(self, item_ids: Iterable[str], ancestor: str = '') -> dict[str, tuple[str, tuple[str, str], str]]:
+        """
+        여러 항목의 전체 경로를 한꺼번에 조회
+
+        같은 단계의 상위 폴더를 모아서 중복을 제거한 뒤 배치 요청으로 가져오므로
+        같은 폴더 트리의 항목은 트리 깊이만큼의 요청으로 처리됨.
+
+        Args:
+            item_ids: 항목 ID 목록
+            ancestor: `폴더ID#경로` 형식. 해당 폴더부터는 지정한 경로로 표시
+
+        Returns:
+            `{id: get_full_path()의 반환값}`. 다시 요청해도 조회하지 못한(`name`이 없는) 항목은 제외
+
+        Examples:
+            >>> google_drive.get_full_paths(['1aBcD...', '1eFgH...'], ancestor='0AbCd...#/mnt/gds')
+        """
+        item_ids = tuple(dict.fromkeys(item_id for item_id in item_ids if item_id))
+        get_file = self.get_file.__wrapped__ if self.cache_enable else self.get_file
+        files = {}
+        for item_id, file in self.get_files_batch(item_ids, 'id, name, parents, mimeType, webViewLink').items():
+            if not file.get('name'):
+                # 배치 요청 중 실패한 항목은 하나씩 다시 요청
+                file = get_file(item_id)
+            if file.get('name'):
+                files[item_id] = file
+            else:
+                logger.debug(f'항목을 조회하지 못함: {item_id}')
+        if self.folders:
+            self.folders.put_many(files.values())
+        ancestor_id = ancestor.partition('#')[0]
+        nodes = {}
+        frontier = {file['parents'][0] for file in files.values() if file.get('parents')}
+        depth = 0
+        while frontier and depth < 100:
+            pending = frontier - nodes.keys()
+            if self.folders and pending:
+                cached = self.folders.get_many(pending)
+                nodes.update(cached)
+                pending -= cached.keys()
+            if pending:
+                # 실패한 폴더는 nodes에 넣지 않아서 경로를 만들 때 get_folder()로 하나씩 다시 요청
+                fetched = {folder_id: folder for folder_id, folder in self.get_files_batch(pending, FOLDER_FIELDS).items() if folder.get('name')}
+                if self.folders:
+                    self.folders.put_many(fetched.values())
+                nodes.update(fetched)
+            frontier = {
+                nodes[folder_id]['parents'][0]
+                for folder_id in frontier
+                if folder_id != ancestor_id and nodes.get(folder_id, {}).get('parents')
+            }
+            depth += 1
+        logger.debug(f'경로 조회: 항목={len(item_ids)} 폴더={len(nodes)} 단계={depth}')
+        return {
+            item_id: self.build_full_path(file, lambda folder_id: nodes.get(folder_id) or self.get_folder(folder_id), ancestor)
+            for item_id, file in files.items()
+        }
 
-    def get_file(self, item_id: str, fields: str = 'id, name, parents, mimeType, webViewLink', ttl_hash: int | float = 3600) -> dict:
+    def get_files_batch(self, item_ids: Iterable[str], fields: str = FOLDER_FIELDS, batch_size: int = 100) -> dict[str, dict]:
+        """
+        files().get() 요청을 배치 요청으로 묶어서 실행
+
+        Args:
+            item_ids: 항목 ID 목록
+            fields: 가져올 필드
+            batch_size: 배치 요청 하나에 담을 요청 수. 구글 드라이브는 최대 100개
+
+        Returns:
+            `{id: 항목 정보}`. 실패한 항목은 `{'id': id}`
+        """
+        results = {}
+
+        def callback(request_id: str, response: dict, exception: Exception) -> None:
+            if exception:
+                self.handle_error(exception)
+                results[request_id] = {'id': request_id}
+            else:
+                results[request_id] = response
+
+        item_ids = tuple(dict.fromkeys(item_ids))
+        for idx in range(0, len(item_ids), batch_size):
+            chunk = item_ids[idx:idx + batch_size]
+            batch = self.api_drive.new_batch_http_request(callback=callback)
+            for item_id in chunk:
+                batch.add(self.api_drive.files().get(fileId=item_id, fields=fields, supportsAllDrives=True), request_id=item_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                self.handle_error(e)
+            for item_id in chunk:
+                results.setdefault(item_id, {'id': item_id})
+        return results
+
+    def get_file(self, item_id: str, fields: str = 'id, name, parents, mimeType, webViewLink') -> dict:
         result = {'id': item_id}
         try:
             result = self.api_drive.files().get(
@@ -123,13 +405,69 @@ class GoogleDrive:
             self.handle_error(e)
         return result
 
-    def get_files(self, query: str) -> dict:
-        result = self.api_drive.files().list(
+    def list_files(self, query: str, fields: str = 'nextPageToken, files(id, name, parents, mimeType)', page_size: int = 1000, page_token: str = None) -> dict:
+        return self.api_drive.files().list(
             q=query,
+            fields=fields,
+            pageSize=page_size,
+            pageToken=page_token,
             supportsAllDrives=True,
             includeItemsFromAllDrives=True,
         ).execute()
-        return result
+
+    def iter_files(self, query: str, fields: str = 'nextPageToken, files(id, name, parents, mimeType)', page_size: int = 1000, prefetch: bool = False) -> Generator[dict, None, None]:
+        """
+        검색 결과를 페이지 단위로 요청하면서 항목을 하나씩 반환
+
+        Args:
+            query: 검색 쿼리
+            fields: 가져올 필드. `nextPageToken`이 포함되어야 다음 페이지를 요청할 수 있음
+            page_size: 페이지 크기. 구글 드라이브는 최대 1000
+            prefetch: 현재 페이지를 처리하는 동안 다음 페이지를 미리 요청할지 여부.
+                중간에 반복을 멈추면 진행 중인 요청을 기다리지 않지만 요청 자체가 취소되지는 않음
+
+        Yields:
+            files().list()의 `files` 항목
+
+        Examples:
+            >>> for file in google_drive.iter_files("'1aBcD...' in parents and trashed = false", prefetch=True):
+            ...     print(file['name'])
+        """
+        if 'nextPageToken' not in fields:
+            fields = f'nextPageToken, {fields}'
+        if not prefetch:
+            page_token = None
+            while True:
+                page = self.list_files(query, fields=fields, page_size=page_size, page_token=page_token)
+                yield from page.get('files') or ()
+                if not (page_token := page.get('nextPageToken')):
+                    break
+            return
+        # 다음 페이지 한 개만 미리 요청
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(self.list_files, query, fields, page_size, None)
+            while future:
+                page = future.result()
+                page_token = page.get('nextPageToken')
+                future = executor.submit(self.list_files, query, fields, page_size, page_token) if page_token else None
+                yield from page.get('files') or ()
+        finally:
+            # 중간에 닫아도 기다리지 않음. 이미 시작된 요청은 백그라운드 스레드에서 끝나고 결과는 버려짐
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_files(self, query: str, fields: str = 'nextPageToken, files(id, name, parents, mimeType)') -> dict:
+        """
+        검색 결과를 모든 페이지에서 가져옴
+
+        Args:
+            query: 검색 쿼리
+            fields: 가져올 필드
+
+        Returns:
+            `{'files': [...]}`
+        """
+        return {'files': list(self.iter_files(query, fields=fields))}
 
     def handle_error(self, error: Exception) -> None:
         if isinstance(error, errors.HttpError):
@@ -138,8 +476,424 @@ class GoogleDrive:
             logger.error(traceback.format_exc())
 
 
-google_drive = GoogleDrive(config.token, 
+google_drive = GoogleDrive(config.token,
                            config.scopes,
                            config.cache_enable,
                            config.cache_maxsize,
-                           config.cache_ttl)
+                           config.cache_ttl,
+                           config.folder_cache,
+                           config.folder_cache_ttl)
+
+
+# rclone 마운트에서 드라이브 이름의 '/'는 전각 문자로 표시됨
+RCLONE_NAME_TABLE = str.maketrans({'／': '/'})
+
+
+def normalize_name(name: str) -> str:
+    """
+    마운트의 파일 이름과 드라이브의 이름을 비교하기 위해 정규화
+
+    Examples:
+        >>> normalize_name('A／B') == normalize_name('A/B')
+        True
+    """
+    return unicodedata.normalize('NFC', name).translate(RCLONE_NAME_TABLE)
+
+
+class DriveListing:
+    """
+    마운트 경로 대신 구글 드라이브 폴더 목록으로 파일 존재 여부를 확인
+
+    로컬 경로를 mappings로 드라이브 경로로 바꾸고, roots에 지정한 폴더 ID부터 경로를 따라 내려가면서
+    각 폴더의 목록을 한 번씩만 조회함. rclone 마운트의 디렉토리 캐시 상태와 관계 없이 판단할 수 있음.
+    이름은 `normalize_name()`으로 정규화해서 비교함.
+
+    존재하지 않는다고 판단하면 삭제로 이어지므로 드라이브 경로로 바꿀 수 없거나
+    roots에서 폴더 ID를 찾을 수 없는 경로는 추측하지 않고 예외를 발생시킴.
+    """
+
+    def __init__(self, drive: GoogleDrive = None, mappings: Mapping[str, str] = None, roots: Mapping[str, str] = None) -> None:
+        """
+        Args:
+            drive: GoogleDrive 인스턴스. 기본값: `google_drive`
+            mappings: `{드라이브 경로: 로컬 경로}` 형식의 경로 매핑. 기본값: google 설정의 mappings
+            roots: `{드라이브 경로: 폴더 ID}` 형식. 기본값: google 설정의 roots
+        """
+        self.drive = drive or google_drive
+        self.mappings = config.mappings if mappings is None else mappings
+        self.roots = {str(pathlib.PurePosixPath(path)): folder_id for path, folder_id in (config.roots if roots is None else roots).items()}
+        if not self.roots:
+            raise Exception('roots 값이 없습니다. google 설정의 roots에 드라이브 경로의 폴더 ID를 지정하세요.')
+        self._children: dict[str, dict[str, list[tuple[str, bool]]]] = {}
+        self._lock = threading.Lock()
+
+    def to_drive_path(self, path: str) -> str | None:
+        for drive_path, local_path in self.mappings.items():
+            if path == local_path or path.startswith(local_path.rstrip('/') + '/'):
+                return drive_path.rstrip('/') + path[len(local_path.rstrip('/')):]
+        return None
+
+    def find_root(self, drive_path: pathlib.PurePosixPath) -> tuple[str, tuple[str]]:
+        # 가장 깊은 roots 경로를 우선 사용
+        for parent in (drive_path, *drive_path.parents):
+            if (folder_id := self.roots.get(str(parent))):
+                return folder_id, drive_path.parts[len(parent.parts):]
+        raise Exception(f'roots에서 폴더 ID를 찾을 수 없습니다: {drive_path}')
+
+    def list_children(self, folder_id: str) -> dict[str, list[tuple[str, bool | None]]]:
+        """
+        폴더의 하위 항목을 `{정규화한 이름: [(ID, 폴더 여부), ...]}` 형식으로 반환
+
+        바로 가기는 rclone처럼 대상 항목으로 취급함. 대상을 알 수 없는 바로 가기의 폴더 여부는 `None`
+        """
+        with self._lock:
+            children = self._children.get(folder_id)
+        if children is not None:
+            return children
+        children = {}
+        query = f"'{folder_id}' in parents and trashed = false"
+        for file in self.drive.iter_files(query, fields='nextPageToken, files(id, name, mimeType, shortcutDetails(targetId, targetMimeType))'):
+            item_id, mime_type = file['id'], file.get('mimeType')
+            if mime_type == SHORTCUT_MIME_TYPE:
+                details = file.get('shortcutDetails') or {}
+                item_id = details.get('targetId')
+                mime_type = details.get('targetMimeType')
+            is_folder = None if not item_id or not mime_type else mime_type == FOLDER_MIME_TYPE
+            children.setdefault(normalize_name(file['name']), []).append((item_id or file['id'], is_folder))
+        with self._lock:
+            self._children[folder_id] = children
+        return children
+
+    def exists(self, path: str) -> bool:
+        """
+        경로가 드라이브에 존재하는지 확인. 폴더 목록을 요청하므로 비동기 함수에서는 `asyncio.to_thread()`로 실행
+
+        Args:
+            path: 로컬 경로
+
+        Returns:
+            존재 여부
+
+        Raises:
+            Exception: 드라이브 경로로 바꿀 수 없거나 roots에서 폴더 ID를 찾을 수 없을 경우,
+                대상을 알 수 없는 바로 가기를 거쳐야 하는 경우
+        """
+        drive_path = self.to_drive_path(str(path))
+        if not drive_path:
+            raise Exception(f'드라이브 경로로 바꿀 수 없습니다: {path}')
+        folder_id, parts = self.find_root(pathlib.PurePosixPath(drive_path))
+        candidates = [folder_id]
+        for idx, name in enumerate(map(normalize_name, parts)):
+            last = idx == len(parts) - 1
+            matches = [
+                (item_id, is_folder)
+                for candidate in candidates
+                for item_id, is_folder in self.list_children(candidate).get(name, ())
+            ]
+            if last:
+                return bool(matches)
+            # 같은 이름의 폴더가 여러 개일 수 있음
+            candidates = [item_id for item_id, is_folder in matches if is_folder]
+            if not candidates:
+                if any(is_folder is None for _, is_folder in matches):
+                    raise Exception(f'대상을 알 수 없는 바로 가기가 경로에 있습니다: {path}')
+                return False
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+
+class AsyncGoogleDrive:
+    """
+    aiohttp 기반의 구글 드라이브 클라이언트
+
+    `helpers.get_session('google')` 세션을 사용해서 다른 서비스의 기본 헤더나 연결 수 제한에 영향을 받지 않음.
+    액세스 토큰은 만료되기 전에 한 번만 갱신하고 401 응답을 받으면 갱신 후 한 번 재요청함.
+    """
+
+    DRIVE_URL = 'https://www.googleapis.com/drive/v3'
+    BATCH_URL = 'https://www.googleapis.com/batch/drive/v3'
+    ACTIVITY_URL = 'https://driveactivity.googleapis.com/v2'
+    TOKEN_URL = 'https://oauth2.googleapis.com/token'
+
+    def __init__(self, token: dict, folders: FolderCache = None, timeout: int = 30, margin: int = 60, retry: RetryPolicy = DEFAULT_RETRY) -> None:
+        """
+        Args:
+            token: client_id, client_secret, refresh_token 값
+            folders: 폴더 캐시
+            timeout: 요청 제한 시간 (초)
+            margin: 액세스 토큰 만료 전 갱신할 여유 시간 (초)
+            retry: 재시도 정책
+        """
+        self.token = token
+        self.retry = retry
+        self.folders = folders
+        self.timeout = timeout
+        self.margin = margin
+        self._access_token: str = None
+        self._expires_at: float = 0
+        self._lock: asyncio.Lock = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return get_session('google', timeout=self.timeout, **config.session)
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def get_access_token(self) -> str | None:
+        if self._access_token and time.time() < self._expires_at - self.margin:
+            return self._access_token
+        async with self.lock:
+            if self._access_token and time.time() < self._expires_at - self.margin:
+                return self._access_token
+            result = await request_api(self.session, {
+                'url': self.token.get('token_uri') or self.TOKEN_URL,
+                'method': 'POST',
+                'data': {
+                    'client_id': self.token.get('client_id'),
+                    'client_secret': self.token.get('client_secret'),
+                    'refresh_token': self.token.get('refresh_token'),
+                    'grant_type': 'refresh_token',
+                },
+            }, timeout=self.timeout)
+            if not 300 > result['status_code'] > 199:
+                logger.error(f'Google: 토큰 갱신 실패 status_code={result["status_code"]} {result["json"] or result["text"]}')
+                return None
+            self._access_token = result['json'].get('access_token')
+            self._expires_at = time.time() + int(result['json'].get('expires_in') or 3600)
+            return self._access_token
+
+    def invalidate_token(self, access_token: str) -> None:
+        # 다른 코루틴이 이미 갱신한 토큰은 유지
+        if access_token == self._access_token:
+            self._access_token = None
+
+    async def request(self, api: dict) -> dict:
+        """
+        인증 헤더를 추가해서 요청. 401 응답이면 토큰을 갱신한 뒤 한 번 재요청
+
+        Args:
+            api: `helpers.request_api()` 형식의 API 정보
+
+        Returns:
+            `helpers.request_api()`의 결과
+        """
+        for attempt in range(2):
+            access_token = await self.get_access_token()
+            headers = {**(api.get('headers') or {}), 'Authorization': f'Bearer {access_token}'}
+            result = await request_with_retry(self.session, {**api, 'headers': headers}, timeout=self.timeout, retry=self.retry)
+            if result['status_code'] != 401:
+                break
+            self.invalidate_token(access_token)
+        if not 300 > result['status_code'] > 199:
+            error = (result['json'] or {}).get('error') or {}
+            logger.error(f'Google: status_code={result["status_code"]} reason="{error.get("message") or result["exception"] or result["text"]}" uri="{api.get("url")}"')
+        return result
+
+    async def get_file(self, item_id: str, fields: str = 'id, name, parents, mimeType, webViewLink') -> dict:
+        result = await self.request({
+            'url': f'{self.DRIVE_URL}/files/{urllib.parse.quote(item_id)}',
+            'method': 'GET',
+            'params': {'fields': fields, 'supportsAllDrives': 'true'},
+        })
+        return result['json'] if result['status_code'] == 200 else {'id': item_id}
+
+    async def list_files(self, query: str, fields: str = 'nextPageToken, files(id, name, parents, mimeType)', page_size: int = 1000) -> AsyncGenerator[dict, None]:
+        """
+        검색 결과를 페이지 단위로 요청하면서 항목을 하나씩 반환
+
+        Args:
+            query: 검색 쿼리
+            fields: 가져올 필드
+            page_size: 페이지 크기. 구글 드라이브는 최대 1000
+
+        Yields:
+            files.list의 `files` 항목
+
+        Raises:
+            Exception: 페이지 요청에 실패했을 경우. 마지막 페이지와 구분하기 위해 조용히 끝내지 않음
+        """
+        if 'nextPageToken' not in fields:
+            fields = f'nextPageToken, {fields}'
+        params = {
+            'q': query,
+            'fields': fields,
+            'pageSize': str(page_size),
+            'supportsAllDrives': 'true',
+            'includeItemsFromAllDrives': 'true',
+        }
+        while True:
+            result = await self.request({'url': f'{self.DRIVE_URL}/files', 'method': 'GET', 'params': params})
+            if result['status_code'] != 200:
+                raise Exception(f'목록 조회 실패: status_code={result["status_code"]} {result["exception"] or result["text"]}')
+            for file in result['json'].get('files') or ():
+                yield file
+            if not (page_token := result['json'].get('nextPageToken')):
+                return
+            params['pageToken'] = page_token
+
+    async def query_activity(self, body: dict) -> dict:
+        """
+        Drive Activity API의 activity:query 요청
+
+        Args:
+            body: 요청 본문. ancestorName, filter, pageToken 등
+
+        Returns:
+            `{'activities': [...], 'nextPageToken': ...}`
+
+        Raises:
+            Exception: 요청에 실패했을 경우. 마지막 페이지와 구분하기 위해 빈 결과를 반환하지 않음
+        """
+        # 조회 요청이므로 POST지만 재시도해도 안전
+        result = await self.request({'url': f'{self.ACTIVITY_URL}/activity:query', 'method': 'POST', 'json': body, 'idempotent': True})
+        if result['status_code'] != 200:
+            raise Exception(f'활동 조회 실패: status_code={result["status_code"]} {result["exception"] or result["text"]}')
+        return result['json'] or {}
+
+    async def batch_get_files(self, item_ids: Iterable[str], fields: str = FOLDER_FIELDS, batch_size: int = 100) -> dict[str, dict]:
+        """
+        files.get 요청을 multipart/mixed 배치 요청으로 묶어서 실행
+
+        Args:
+            item_ids: 항목 ID 목록
+            fields: 가져올 필드
+            batch_size: 배치 요청 하나에 담을 요청 수. 구글 드라이브는 최대 100개
+
+        Returns:
+            `{id: 항목 정보}`. 실패한 항목은 `{'id': id}`
+        """
+        item_ids = tuple(dict.fromkeys(item_ids))
+        chunks = [item_ids[idx:idx + batch_size] for idx in range(0, len(item_ids), batch_size)]
+        results = {}
+        for parts in await asyncio.gather(*(self.execute_batch(chunk, fields) for chunk in chunks)):
+            results.update(parts)
+        for item_id in item_ids:
+            results.setdefault(item_id, {'id': item_id})
+        return results
+
+    async def execute_batch(self, item_ids: Sequence[str], fields: str) -> dict[str, dict]:
+        boundary = f'batch_{uuid.uuid4().hex}'
+        query = urllib.parse.urlencode({'fields': fields, 'supportsAllDrives': 'true'})
+        body = ''.join(
+            f'--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <{idx}>\r\n\r\n'
+            f'GET /drive/v3/files/{urllib.parse.quote(item_id)}?{query}\r\n\r\n'
+            for idx, item_id in enumerate(item_ids)
+        ) + f'--{boundary}--\r\n'
+        result = await self.request({
+            'url': self.BATCH_URL,
+            'method': 'POST',
+            'data': body.encode(),
+            'headers': {'Content-Type': f'multipart/mixed; boundary={boundary}'},
+            'idempotent': True,
+        })
+        if result['status_code'] != 200:
+            return {}
+        responses = {}
+        for content_id, status, payload in parse_multipart_responses(result['content'] or result['text'].encode()):
+            try:
+                item_id = item_ids[int(content_id.rpartition('-')[2])]
+            except (ValueError, IndexError):
+                continue
+            if status == 200:
+                responses[item_id] = payload
+            else:
+                logger.error(f'Google: status_code={status} reason="{(payload.get("error") or {}).get("message")}" id={item_id}')
+        return responses
+
+    async def get_full_paths(self, item_ids: Iterable[str], ancestor: str = '') -> dict[str, tuple[str, tuple[str, str], str]]:
+        """
+        `GoogleDrive.get_full_paths()`의 비동기 버전
+        삭제되는 등의 이유로 조회하지 못한(`name`이 없는) 항목은 결과에서 제외
+        """
+        item_ids = tuple(dict.fromkeys(item_id for item_id in item_ids if item_id))
+        files = await self.batch_get_files(item_ids, 'id, name, parents, mimeType, webViewLink')
+        for item_id in item_ids:
+            if not files[item_id].get('name'):
+                logger.debug(f'항목을 조회하지 못함: {item_id}')
+                del files[item_id]
+        if self.folders:
+            await asyncio.to_thread(self.folders.put_many, files.values())
+        ancestor_id = ancestor.partition('#')[0]
+        nodes = {}
+        frontier = {file['parents'][0] for file in files.values() if file.get('parents')}
+        depth = 0
+        while frontier and depth < 100:
+            pending = frontier - nodes.keys()
+            if self.folders and pending:
+                cached = await asyncio.to_thread(self.folders.get_many, pending)
+                nodes.update(cached)
+                pending -= cached.keys()
+            if pending:
+                fetched = await self.batch_get_files(pending, FOLDER_FIELDS)
+                if self.folders:
+                    await asyncio.to_thread(self.folders.put_many, fetched.values())
+                nodes.update(fetched)
+            frontier = {
+                nodes[folder_id]['parents'][0]
+                for folder_id in frontier
+                if folder_id != ancestor_id and nodes.get(folder_id, {}).get('parents')
+            }
+            depth += 1
+        return {
+            item_id: GoogleDrive.build_full_path(file, lambda folder_id: nodes.get(folder_id) or {'id': folder_id}, ancestor)
+            for item_id, file in files.items()
+        }
+
+    async def get_full_path(self, item_id: str, ancestor: str = '') -> tuple[str, tuple[str, str], str]:
+        if not item_id:
+            raise Exception(f'ID를 확인하세요: "{item_id}"')
+        paths = await self.get_full_paths((item_id,), ancestor)
+        if item_id not in paths:
+            raise Exception(f'항목을 조회하지 못했습니다: "{item_id}"')
+        return paths[item_id]
+
+    async def close(self) -> None:
+        session = sessions.get('google')
+        if session and not session.closed:
+            await session.close()
+
+
+def parse_multipart_responses(content: bytes) -> Generator[tuple[str, int, dict], None, None]:
+    """
+    배치 요청의 multipart/mixed 응답을 파싱
+
+    Args:
+        content: 응답 본문
+
+    Yields:
+        (Content-ID, 상태 코드, JSON 본문)
+    """
+    text = content.decode('utf-8', errors='replace')
+    first_line = text.lstrip().split('\n', 1)[0].strip()
+    if not first_line.startswith('--'):
+        return
+    for part in text.split(first_line)[1:]:
+        if part.startswith('--'):
+            break
+        part_headers, _, http_response = part.strip().partition('\r\n\r\n')
+        content_id = ''
+        for line in part_headers.splitlines():
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'content-id':
+                content_id = value.strip().strip('<>')
+        status_line, _, rest = http_response.partition('\r\n')
+        _, _, payload = rest.partition('\r\n\r\n')
+        try:
+            status = int(status_line.split()[1])
+        except (IndexError, ValueError):
+            continue
+        try:
+            body = json.loads(payload) if payload.strip() else {}
+        except ValueError:
+            body = {}
+        yield content_id, status, body
+
+
+async_google_drive = AsyncGoogleDrive(config.token, folders=google_drive.folders)
@@ -1,13 +1,20 @@
 import re
 import sys
 import time
+import random
 import asyncio
 import logging
 import sqlite3
 import datetime
 import functools
+import threading
 import subprocess
-from typing import Any, Generator, Sequence, Iterable, Coroutine, Callable
+import dataclasses
+import email.utils
+import urllib.parse
+import collections
+import concurrent.futures
+from typing import Any, Generator, Sequence, Iterable, Coroutine, Callable, Mapping
 
 
 def check_packages(packages: Iterable[Sequence[str]]) -> None:
@@ -22,6 +29,7 @@ check_packages((('psutil', 'psutil'), ('aiohttp', 'aiohttp')))
 
 import psutil
 import aiohttp
+import multidict
 
 logger = logging.getLogger(__name__)
 
@@ -79,6 +87,60 @@ def retrieve_db(database: str) -> Callable:
     return decorator
 
 
+KEYSET_UNSUPPORTED = re.compile(r'\b(LIMIT|OFFSET|ORDER\s+BY)\b', re.IGNORECASE)
+KEYSET_TRAILING_LIMIT = re.compile(r'\s+LIMIT\s+(\d+)\s*$', re.IGNORECASE)
+
+
+def fetch_by_keyset(database: str, query: str, params: Sequence | dict = (), page_size: int = 1000, key: str = 'id') -> Generator[dict, None, None]:
+    """
+    쿼리 결과를 key 컬럼 기준으로 page_size 만큼씩 나눠서 조회
+    페이지마다 연결을 새로 열고 닫아서 읽기 트랜잭션을 짧게 유지
+
+    쿼리를 `SELECT * FROM (query) WHERE key > ? ORDER BY key LIMIT n` 형식으로 감싸서 조회하므로
+    - 쿼리 결과에 정수형 key 컬럼이 있고 그 값이 중복되지 않아야 함. 조인 등으로 중복되면 예외 발생
+    - 쿼리 끝의 `LIMIT n`은 전체 조회 개수로 적용하고 key 순서로 조회함
+    - 그 외의 LIMIT, OFFSET, ORDER BY가 포함된 쿼리는 페이지마다 다시 적용되므로 사용할 수 없음
+    """
+    query = query.strip().rstrip(';').strip()
+    limit_total = None
+    if match := KEYSET_TRAILING_LIMIT.search(query):
+        limit_total = int(match.group(1))
+        query = query[:match.start()]
+    # 문자열 리터럴 안의 단어는 제외하고 검사
+    if match := KEYSET_UNSUPPORTED.search(re.sub(r"'(?:[^']|'')*'", "''", query)):
+        raise Exception(f'페이지 단위로 조회할 수 없는 쿼리입니다: {match.group(1)} "{query}"')
+    placeholder = ':_keyset_last' if isinstance(params, dict) else '?'
+    # 페이지 경계에서 key 중복을 확인하기 위해 한 행을 더 조회
+    limit = int(page_size) + 1
+    first_query = f'SELECT * FROM ({query}) ORDER BY {key} LIMIT {limit}'
+    next_query = f'SELECT * FROM ({query}) WHERE {key} > {placeholder} ORDER BY {key} LIMIT {limit}'
+    last = None
+    while True:
+        if last is None:
+            page_query, page_params = first_query, params
+        elif isinstance(params, dict):
+            page_query, page_params = next_query, {**params, '_keyset_last': last}
+        else:
+            page_query, page_params = next_query, (*params, last)
+        con = sqlite3.connect(database)
+        try:
+            con.row_factory = dict_factory
+            rows = con.execute(page_query, page_params).fetchall()
+        finally:
+            con.close()
+        keys = [row[key] for row in rows]
+        if None in keys or len(set(keys)) < len(keys):
+            raise Exception(f'{key} 값이 비어 있거나 중복됩니다. 고유한 컬럼을 key로 지정하세요: "{query}"')
+        page = rows[:page_size]
+        if limit_total is not None:
+            page = page[:limit_total]
+            limit_total -= len(page)
+        yield from page
+        if len(rows) <= page_size or limit_total == 0:
+            break
+        last = keys[page_size - 1]
+
+
 async def check_tasks(tasks: list[asyncio.Task], interval: int = 60) -> None:
     last_time = time.time()
     while tasks:
@@ -135,26 +197,67 @@ def set_logger(level: str = None,
         )
 
 
-async def queue_task(coroutine: Coroutine, queue: asyncio.Queue, data: Iterable, *args: Any, task_size: int = 1, prefix: str = 'task', interval: int = 60, **kwds: Any) -> None:
+async def queue_task(coroutine: Coroutine, queue: asyncio.Queue, data: Iterable, *args: Any, task_size: int = 1, prefix: str = 'task', interval: int = 60, total: int = None, **kwds: Any) -> None:
+    """
+    data의 항목을 queue에 넣고 task_size 개의 작업자가 처리
+    queue에 maxsize를 지정하면 작업자가 처리하는 만큼만 data를 읽어서 대기
+    interval 마다 진행 상황, 대기열 크기, 메모리 사용량을 출력
+    """
     tasks = []
     for i in range(task_size):
         name = f"{prefix}-{i}"
         task = asyncio.create_task(coroutine(queue, name, *args, **kwds), name=name)
         tasks.append(task)
+    workers = tuple(tasks)
     check_task = asyncio.create_task(check_tasks(tasks, interval=interval), name=f'checking-{prefix}')
-    whole_tasks = (check_task, *tasks)
-    for item in data:
-        await queue.put(item)
-    for _ in range(task_size):
-        await queue.put(None)
+    whole_tasks = (check_task, *workers)
+    fed = 0
+    start = time.time()
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            taken = fed - queue.qsize()
+            elapsed = time.time() - start
+            logger.info(
+                f'{prefix}: 진행 {taken}{f"/{total}" if total else ""} '
+                f'대기열 {queue.qsize()}/{queue.maxsize or "-"} '
+                f'처리량 {taken / elapsed:.2f}/s '
+                f'메모리 {mem_usage():.1f}MB'
+            )
+
+    async def put(item: Any) -> bool:
+        # 작업자가 모두 종료되면 대기열이 비워지지 않으므로 주기적으로 확인
+        while True:
+            if all(worker.done() for worker in workers):
+                logger.error(f'{prefix}: 작업자가 모두 종료되었습니다.')
+                return False
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=1)
+                return True
+            except asyncio.TimeoutError:
+                continue
+
+    report_task = asyncio.create_task(report(), name=f'reporting-{prefix}')
     try:
+        for item in data:
+            if not await put(item):
+                break
+            fed += 1
+        else:
+            for _ in range(task_size):
+                if not await put(None):
+                    break
         await asyncio.gather(*whole_tasks)
     except asyncio.CancelledError:
         for task in whole_tasks:
             if task.cancelled():
                 logger.warning(f"Canceled: {task.get_name()}")
-            elif exception := task.exception():
+            elif task.done() and (exception := task.exception()):
                 logger.error(f"{task.get_name()}: {exception}")
+    finally:
+        report_task.cancel()
+        logger.info(f'{prefix}: 완료 {fed} 건, {time.time() - start:.1f}s, 메모리 {mem_usage():.1f}MB')
 
 
 def countdown(seconds: int) -> None:
@@ -192,77 +295,422 @@ class RedactedFormatter(logging.Formatter):
         return pattern.sub(self.substitute, text)
 
 
+shared_connector: aiohttp.TCPConnector | None = None
+def get_shared_connector(limit: int = 100, limit_per_host: int = 0) -> aiohttp.TCPConnector:
+    global shared_connector
+    if shared_connector is None or shared_connector.closed:
+        shared_connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return shared_connector
+
+
 shared_session: aiohttp.ClientSession | None = None
 def get_shared_session(default_headers: dict | None = None, timeout: int = 30, limit: int = 100, limit_per_host: int = 0) -> aiohttp.ClientSession:
     global shared_session
     if shared_session is None or shared_session.closed:
-        conn = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+        conn = get_shared_connector(limit=limit, limit_per_host=limit_per_host)
         shared_session = aiohttp.ClientSession(headers=default_headers, timeout=aiohttp.ClientTimeout(total=timeout), connector=conn)
     return shared_session
 
 
-def http_api(default_headers: dict = None, timeout: int = 30) -> Callable:
+sessions: dict[str, aiohttp.ClientSession] = {}
+def get_session(service: str, default_headers: dict | None = None, timeout: int = 30, limit: int = 100, limit_per_host: int = 0, keepalive_timeout: float = 15.0, ttl_dns_cache: int = 10) -> aiohttp.ClientSession:
+    """
+    서비스별 세션을 반환
+
+    서비스마다 커넥터를 따로 만들어서 기본 헤더와 연결 수 제한이 다른 서비스에 영향을 주지 않도록 함.
+    설정 값은 세션을 처음 만들 때만 적용됨.
+
+    Args:
+        service: 서비스 이름 또는 기본 URL
+        default_headers: 세션의 기본 헤더
+        timeout: 기본 요청 제한 시간 (초)
+        limit: 최대 동시 연결 수 (0: 제한 없음)
+        limit_per_host: 호스트별 최대 동시 연결 수 (0: 제한 없음)
+        keepalive_timeout: 사용하지 않는 연결을 유지할 시간 (초)
+        ttl_dns_cache: DNS 조회 결과를 유지할 시간 (초)
+
+    Returns:
+        aiohttp.ClientSession
+    """
+    session = sessions.get(service)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout, ttl_dns_cache=ttl_dns_cache)
+        session = sessions[service] = aiohttp.ClientSession(headers=default_headers, timeout=aiohttp.ClientTimeout(total=timeout), connector=connector)
+    return session
+
+
+def get_base_url(url: str) -> str:
+    parsed = urllib.parse.urlsplit(url or '')
+    return f'{parsed.scheme}://{parsed.netloc}'
+
+
+async def close_sessions() -> None:
+    """
+    모든 세션과 공유 커넥터를 닫음. 프로그램 종료 전에 호출
+    """
+    global shared_session, shared_connector
+    for session in (*sessions.values(), shared_session):
+        if session is not None and not session.closed:
+            await session.close()
+    sessions.clear()
+    if shared_connector is not None and not shared_connector.closed:
+        await shared_connector.close()
+    shared_session = None
+    shared_connector = None
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    """
+    http_api의 재시도 정책
+
+    Attributes:
+        attempts: 최대 요청 횟수 (1이면 재시도 안 함)
+        backoff: 첫 재시도 대기 시간 (초). 재시도할 때마다 두 배씩 늘어남
+        max_backoff: 최대 대기 시간 (초)
+        jitter: 대기 시간에 무작위로 더할 비율 (0.5면 최대 50%)
+        statuses: 재시도할 응답 코드
+        methods: 멱등한 메소드. 이외의 메소드는 429 응답일 때만 재시도함.
+            API 정보에 `'idempotent': True`를 지정하면 메소드와 관계 없이 재시도함
+        retry_after: `Retry-After` 헤더를 따를지 여부
+        max_retry_after: `Retry-After` 헤더로 기다릴 최대 시간 (초)
+    """
+    attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: float = 0.5
+    statuses: frozenset[int] = frozenset((429, 500, 502, 503, 504))
+    methods: frozenset[str] = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+    retry_after: bool = True
+    max_retry_after: float = 120.0
+
+    def should_retry(self, api: dict, result: dict, attempt: int) -> bool:
+        if attempt >= self.attempts:
+            return False
+        status = result['status_code']
+        if status not in self.statuses and not (status == 0 and result['exception']):
+            return False
+        idempotent = api.get('idempotent')
+        if idempotent is None:
+            idempotent = (api.get('method') or 'GET').upper() in self.methods
+        # 429는 요청이 처리되지 않았으므로 멱등하지 않아도 재시도
+        return idempotent or status == 429
+
+    def get_delay(self, result: dict, attempt: int) -> float:
+        if self.retry_after and (retry_after := parse_retry_after((result.get('headers') or {}).get('Retry-After'))) is not None:
+            return min(retry_after, self.max_retry_after)
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay + random.uniform(0, delay * self.jitter)
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    `Retry-After` 헤더 값(초 또는 HTTP 날짜)을 대기 시간(초)으로 변환
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=datetime.timezone.utc)
+    return max((retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds(), 0.0)
+
+
+DEFAULT_RETRY = RetryPolicy()
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+async def request_api(session: aiohttp.ClientSession, api: dict, timeout: int = 30) -> dict:
+    """
+    API 정보로 요청하고 결과를 dict로 반환
+
+    API 정보에 `'stream': True`를 지정하면 본문을 읽지 않고 `result['response']`로 응답을 넘겨줌.
+    이 경우 호출한 쪽에서 `response.content`로 나눠 읽은 뒤 `response.release()`로 연결을 반환해야 함.
+    """
+    params: dict = api.get('params')
+    data: dict = api.get('data')
+    json_: dict = api.get('json')
+    headers: dict = api.get('headers') or {}
+    auth: tuple = api.get('auth')
+    url: str = api.get('url')
+    method: str = api.get('method')
+    read_body: bool = api.get('read_body', True)
+    stream: bool = api.get('stream', False)
+    result = {
+        'status_code': 0,
+        'text': '',
+        'exception': '',
+        'json': {},
+        'url': '',
+        'content': b'',
+        'charset': None,
+        'content_type': '',
+        'content_length': None,
+        'headers': multidict.CIMultiDict(),
+    }
+    response = None
+    try:
+        response = await session.request(method, url, params=params, json=json_, data=data, auth=auth, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout))
+        result['status_code'] = response.status
+        result['url'] = str(response.url)
+        # 대소문자 구분 없이 조회하고 같은 이름의 헤더도 유지
+        result['headers'] = multidict.CIMultiDict(response.headers)
+        c_type = (response.content_type or '').lower()
+        result['content_type'] = c_type
+        result['charset'] = response.charset
+        result['content_length'] = response.content_length
+        if stream:
+            result['response'] = response
+        elif response.method == 'HEAD':
+            # HEAD 요청은 본문이 없음
+            pass
+        elif c_type == 'application/json':
+            result['json'] = await response.json()
+        elif c_type.startswith('text/') or c_type in (
+            'application/xml',
+            'application/xhtml+xml',
+            'application/javascript',
+            'application/ecmascript',
+            'application/x-www-form-urlencoded',
+        ):
+            # text 계열이면 text() 호출
+            result['text'] = await response.text()
+        elif read_body:
+            result['content'] = await response.read()
+    except Exception as e:
+        logger.debug(f'{method} {url}: {repr(e)}')
+        result['exception'] = str(e) or repr(e)
+        result.pop('response', None)
+    finally:
+        if response is not None and 'response' not in result:
+            response.release()
+    return result
+
+
+async def request_with_retry(session: aiohttp.ClientSession, api: dict, timeout: int = 30, retry: RetryPolicy = DEFAULT_RETRY) -> dict:
+    """
+    재시도 정책에 따라 `request_api()`를 반복
+    """
+    attempt = 1
+    while True:
+        result = await request_api(session, api, timeout=timeout)
+        if not retry.should_retry(api, result, attempt):
+            break
+        if response := result.pop('response', None):
+            response.release()
+        delay = retry.get_delay(result, attempt)
+        logger.warning(f'재요청 대기 {delay:.1f}초 ({attempt}/{retry.attempts - 1}): {api.get("method")} {api.get("url")} status_code={result["status_code"]} {result["exception"]}')
+        await asyncio.sleep(delay)
+        attempt += 1
+    if not 400 > result['status_code'] > 199:
+        message = f'요청 실패: {api.get("method")} {api.get("url")} status_code={result["status_code"]} attempts={attempt} {result["exception"] or ""}'.rstrip()
+        if result['exception'] or result['status_code'] in retry.statuses:
+            logger.error(message)
+        else:
+            # 404 등은 호출한 쪽에서 처리하는 응답
+            logger.debug(message)
+    return result
+
+
+def http_api(default_headers: dict = None, timeout: int = 30, on_unauthorized: Callable[[dict], Coroutine] = None, retry: RetryPolicy = DEFAULT_RETRY, service: str = None, session_options: Mapping[str, Any] = None) -> Callable:
+    """
+    API 정보를 반환하는 코루틴을 요청 코루틴으로 감싸는 데코레이터
+
+    Args:
+        default_headers: 세션의 기본 헤더
+        timeout: 요청 제한 시간(초)
+        on_unauthorized: 401 응답을 받았을 때 실패한 API 정보를 인자로 호출할 코루틴.
+            지정하면 호출 후 API 정보를 다시 만들어 한 번만 재요청함.
+        retry: 재시도 정책. 재시도하지 않으려면 `NO_RETRY`
+        service: 사용할 세션의 서비스 이름. 지정하지 않으면 요청 URL의 기본 URL별로 세션을 사용
+        session_options: `get_session()`의 limit, limit_per_host, keepalive_timeout, ttl_dns_cache 값
+
+    Returns:
+        데코레이터
+    """
     def decorator(func: Callable) -> Coroutine:
         @functools.wraps(func)
         async def wrapper(*args: Any, **kwds: Any) -> dict:
             api: dict = await func(*args, **kwds) or {}
-            params: dict = api.get('params')
-            data: dict = api.get('data')
-            json_: dict = api.get('json')
-            headers: dict = api.get('headers') or {}
-            auth: tuple = api.get('auth')
-            url: str = api.get('url')
-            method: str = api.get('method')
-            read_body: bool = api.get('read_body', True)
-            result = {
-                'status_code': 0,
-                'text': '',
-                'exception': '',
-                'json': {},
-                'url': '',
-                'content': b'',
-                'charset': None,
-                'content_type': '',
-            }
-            session = get_shared_session(default_headers, timeout=timeout)
-            try:
-                async with session.request(method, url, params=params, json=json_, data=data, auth=auth, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
-                    result['status_code'] = response.status
-                    result['url'] = str(response.url)
-                    c_type = (response.content_type or '').lower()
-                    result['content_type'] = c_type
-                    result['charset'] = response.charset
-                    if c_type == 'application/json':
-                        result['json'] = await response.json()
-                    elif c_type.startswith('text/') or c_type in (
-                        'application/xml',
-                        'application/xhtml+xml',
-                        'application/javascript',
-                        'application/ecmascript',
-                        'application/x-www-form-urlencoded',
-                    ):
-                        # text 계열이면 text() 호출
-                        result['text'] = await response.text()
-                    elif read_body:
-                        result['content'] = await response.read()
-            except Exception as e:
-                logger.exception(str(e))
-                result['exception'] = str(e)
+            session = get_session(service or get_base_url(api.get('url')), default_headers, timeout=timeout, **(session_options or {}))
+            result = await request_with_retry(session, api, timeout=timeout, retry=retry)
+            if result['status_code'] == 401 and on_unauthorized:
+                logger.warning(f'인증 실패로 재요청: {api.get("url")}')
+                if response := result.pop('response', None):
+                    response.release()
+                await on_unauthorized(api)
+                # 새 인증 정보로 API 정보를 다시 생성
+                api = await func(*args, **kwds) or {}
+                result = await request_with_retry(session, api, timeout=timeout, retry=retry)
             return result
         return wrapper
     return decorator
 
 
-def apply_cache(func: Callable, maxsize: int = 64) -> Callable:
-    @functools.lru_cache(maxsize=maxsize)
-    def wrapper(*args: Any, ttl_hash: int = 3600, **kwds: Any):
-        del ttl_hash
-        return func(*args, **kwds)
-    return wrapper
-
-
-def get_ttl_hash(seconds: int = 3600) -> int:
-    return round(time.time() / seconds)
+CacheInfo = collections.namedtuple('CacheInfo', ('hits', 'misses', 'evictions', 'expired', 'maxsize', 'currsize'))
+
+
+class TTLCache:
+    """
+    항목마다 만료 시각이 있는 LRU 캐시
+
+    maxsize를 넘으면 가장 오래 사용하지 않은 항목부터 삭제하고, ttl이 지난 항목은 조회할 때 삭제함.
+    `get_or_load()`는 같은 키를 동시에 요청하면 한 번만 불러오고 나머지는 그 결과를 기다림.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: int | float = 600) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: collections.OrderedDict[Any, tuple[float, Any]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[Any, concurrent.futures.Future] = {}
+        self._loading_async: dict[Any, asyncio.Task] = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0}
+
+    def _get(self, key: Any) -> tuple[bool, Any]:
+        # self._lock 안에서 호출
+        item = self._data.get(key)
+        if item is not None:
+            expires_at, value = item
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self._stats['hits'] += 1
+                return True, value
+            del self._data[key]
+            self._stats['expired'] += 1
+        self._stats['misses'] += 1
+        return False, None
+
+    def _set(self, key: Any, value: Any, ttl: int | float = None) -> None:
+        # self._lock 안에서 호출
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            found, value = self._get(key)
+        return value if found else default
+
+    def set(self, key: Any, value: Any, ttl: int | float = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any], cacheable: Callable[[Any], bool] = None) -> Any:
+        """
+        캐시에 없으면 loader를 호출해서 저장. 같은 키를 다른 스레드가 불러오는 중이면 그 결과를 기다림
+
+        Args:
+            key: 키
+            loader: 값을 불러올 함수
+            cacheable: 불러온 값을 저장할지 판단하는 함수. 지정하지 않으면 모두 저장
+        """
+        with self._lock:
+            found, value = self._get(key)
+            if found:
+                return value
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = concurrent.futures.Future()
+        if not owner:
+            return future.result()
+        try:
+            value = loader()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            if cacheable is None or cacheable(value):
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    async def get_or_load_async(self, key: Any, loader: Callable[[], Coroutine], cacheable: Callable[[Any], bool] = None) -> Any:
+        """
+        `get_or_load()`의 비동기 버전. loader는 코루틴을 반환하는 함수
+
+        loader는 별도의 태스크로 실행하고 모든 호출자가 `asyncio.shield()`로 기다리므로
+        먼저 요청한 호출자가 취소되어도 다른 호출자는 영향을 받지 않음
+        """
+        with self._lock:
+            found, value = self._get(key)
+        if found:
+            return value
+        task = self._loading_async.get(key)
+        if task is None:
+            async def load() -> Any:
+                try:
+                    value = await loader()
+                    if cacheable is None or cacheable(value):
+                        self.set(key, value)
+                    return value
+                finally:
+                    self._loading_async.pop(key, None)
+            task = self._loading_async[key] = asyncio.ensure_future(load())
+            # 기다리는 호출자가 모두 취소된 경우에도 예외를 확인한 것으로 처리
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return await asyncio.shield(task)
+
+    def invalidate(self, key: Any) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(maxsize=self.maxsize, currsize=len(self._data), **self._stats)
+
+
+def make_cache_key(args: tuple, kwds: dict) -> tuple:
+    return (args, tuple(sorted(kwds.items()))) if kwds else args
+
+
+def ttl_cache(maxsize: int = 128, ttl: int | float = 600, cacheable: Callable[[Any], bool] = None) -> Callable:
+    """
+    TTLCache를 사용하는 데코레이터. 일반 함수와 코루틴 함수 모두 사용 가능
+
+    감싼 함수에 `cache`, `cache_info()`, `cache_clear()`, `invalidate(*args, **kwds)`가 추가됨.
+
+    Args:
+        maxsize: 최대 항목 수
+        ttl: 항목 유효 시간 (초)
+        cacheable: 결과를 저장할지 판단하는 함수. 실패한 결과를 저장하지 않을 때 사용
+
+    Examples:
+        >>> @ttl_cache(maxsize=256, ttl=300, cacheable=lambda file: 'name' in file)
+        ... def get_file(item_id: str) -> dict: ...
+    """
+    def decorator(func: Callable) -> Callable:
+        cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args: Any, **kwds: Any) -> Any:
+                return await cache.get_or_load_async(make_cache_key(args, kwds), lambda: func(*args, **kwds), cacheable)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args: Any, **kwds: Any) -> Any:
+                return cache.get_or_load(make_cache_key(args, kwds), lambda: func(*args, **kwds), cacheable)
+        wrapper.cache = cache
+        wrapper.cache_info = cache.cache_info
+        wrapper.cache_clear = cache.cache_clear
+        wrapper.invalidate = lambda *args, **kwds: cache.invalidate(make_cache_key(args, kwds))
+        return wrapper
+    return decorator
 
 
 def string_bool(value: Any, true: str = 'true', false: str = 'false') -> str:
@@ -1,4 +1,9 @@
+import os
+import re
+import json
 import time
+import base64
+import errno
 import asyncio
 import logging
 import sqlite3
@@ -6,32 +11,105 @@ import pathlib
 import datetime
 import urllib.parse
 import shutil
+import concurrent.futures
 from typing import Any, Generator, Sequence, Callable
 
 from config import kavita as config
-from helpers import http_api, retrieve_db, string_bool
+from helpers import http_api, retrieve_db, string_bool, mem_usage, fetch_by_keyset, queue_task
 
 logger = logging.getLogger(__name__)
 retrieve_db = retrieve_db(config.db)
 
-kavita_token = None
+class KavitaToken:
+    """
+    Kavita 인증 토큰을 서버 주소별로 관리
+
+    토큰이 없거나 만료가 가까우면 한 번만 인증을 요청하고, 동시에 토큰을 요청한 다른 코루틴은 그 결과를 기다림.
+    만료 시각은 JWT의 `exp` 값을 사용하고, 알 수 없으면 401 응답을 받을 때까지 사용함.
+    """
+
+    def __init__(self, margin: int | float = 60) -> None:
+        self.margin = margin
+        self._tokens: dict[str, tuple[str, float]] = {}
+        self._lock: asyncio.Lock = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def get_valid(self, url: str) -> str | None:
+        token, expires_at = self._tokens.get(url, (None, 0))
+        if token and time.time() < expires_at - self.margin:
+            return token
+        return None
+
+    async def get(self, url: str = config.url, apikey: str = config.apikey) -> str | None:
+        if token := self.get_valid(url):
+            return token
+        async with self.lock:
+            # 대기하는 동안 다른 코루틴이 인증했으면 그 토큰을 사용
+            if token := self.get_valid(url):
+                return token
+            result = await plugin_authenticate(url=url, apikey=apikey)
+            if not 300 > (result.get('status_code') or 0) > 199:
+                logger.error(f'인증 실패: {result}')
+                return None
+            token = result.get('json').get('token')
+            self._tokens[url] = (token, get_token_expiry(token))
+            logger.debug(f'인증 토큰 갱신: {url}')
+            return token
+
+    def invalidate(self, token: str = None) -> None:
+        """
+        토큰을 폐기
+
+        Args:
+            token: 폐기할 토큰. 이미 다른 코루틴이 갱신한 토큰은 폐기하지 않음. `None`이면 모두 폐기.
+        """
+        for url, (current, _) in tuple(self._tokens.items()):
+            if token is None or token == current:
+                del self._tokens[url]
+
+    async def on_unauthorized(self, api: dict) -> None:
+        authorization = (api.get('headers') or {}).get('Authorization') or ''
+        self.invalidate(authorization.removeprefix('Bearer '))
+
+
+def get_token_expiry(token: str) -> float:
+    """
+    JWT 토큰의 만료 시각(epoch)을 반환
+
+    Args:
+        token: JWT 토큰
+
+    Returns:
+        만료 시각. 알 수 없으면 `inf`
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except Exception as e:
+        logger.debug(f'토큰 만료 시각을 알 수 없음: {e}')
+        return float('inf')
+
+
+kavita_token = KavitaToken()
+authorized_api = http_api(config.headers, on_unauthorized=kavita_token.on_unauthorized, service='kavita', session_options=config.session)
+
 
 async def get_headers(require_token: bool = True, url: str = config.url, apikey: str = config.apikey) -> dict | None:
-    global kavita_token
     headers = {
         "Content-Type": "application/json"
     }
-    if require_token and kavita_token is None:
-        result = await plugin_authenticate(url=url, apikey=apikey)
-        if not 300 > (result.get('status_code') or 0) > 199:
-            logger.error(f'인증 실패: {result}')
-        else:
-            kavita_token = result.get('json').get('token')
-    headers['Authorization'] = f"Bearer {kavita_token}"
+    if require_token:
+        headers['Authorization'] = f"Bearer {await kavita_token.get(url=url, apikey=apikey)}"
     return headers
 
 
-@http_api(config.headers)
+@http_api(config.headers, service='kavita', session_options=config.session)
 async def plugin_authenticate(url: str = config.url, apikey: str = config.apikey, plugin_name: str = config.plugin_name) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Plugin/authenticate'),
@@ -40,36 +118,40 @@ async def plugin_authenticate(url: str = config.url, apikey: str = config.apikey
     }
 
 
-@http_api(config.headers)
+@http_api(config.headers, service='kavita', session_options=config.session)
 async def scan_folder(folder: str, url: str = config.url, apikey: str = config.apikey) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Library/scan-folder'),
         'json': {'folderPath': folder, 'apiKey': apikey},
         'method': 'POST',
+        # 같은 대상의 스캔은 중복 실행되지 않으므로 재시도해도 안전
+        'idempotent': True,
     }
 
 
-@http_api(config.headers)
+@authorized_api
 async def scan(library_id: int | str, force: bool = False, url: str = config.url, apikey: str = config.apikey) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Library/scan'),
         'params': {'libraryId': library_id, 'force': string_bool(force)},
         'method': 'POST',
+        'idempotent': True,
         'headers': await get_headers(url=url, apikey=apikey)
     }
 
 
-@http_api(config.headers)
+@authorized_api
 async def scan_all(force: bool = False, url: str = config.url, apikey: str = config.apikey) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Library/scan-all'),
         'params': {'force': string_bool(force)},
         'method': 'POST',
+        'idempotent': True,
         'headers': await get_headers(url=url, apikey=apikey)
     }
 
 
-@http_api(config.headers)
+@authorized_api
 async def scan_series(series_id: int, library_id: int = -1, force: bool = False, colorscape: bool = False, url: str = config.url, apikey: str = config.apikey) -> dict:
     if library_id < 1:
         row = fetch_one('SELECT LibraryId FROM Series WHERE id = ?', (series_id,))
@@ -79,6 +161,7 @@ async def scan_series(series_id: int, library_id: int = -1, force: bool = False,
         'url': urllib.parse.urljoin(url, '/api/Series/scan'),
         'json': {'libraryId': library_id, 'seriesId': series_id, 'forceUpdate': force, 'forceColorscape': colorscape},
         'method': 'POST',
+        'idempotent': True,
         'headers': await get_headers(url=url, apikey=apikey)
     }
 
@@ -94,18 +177,19 @@ async def scan_series_by_path(path: str, is_dir: bool = False, force: bool = Fal
     await scan_series(rows[0]['Id'], library_id=rows[0]['LibraryId'], force=force, colorscape=colorscape, url=url, apikey=apikey)
 
 
-@http_api(config.headers)
+@authorized_api
 async def scan_multiple(library_ids: Sequence[int | str], force: bool = False, url: str = config.url, apikey: str = config.apikey) -> dict:
     # 작동 안 하는 듯
     return {
         'url': urllib.parse.urljoin(url, '/api/Library/scan-multiple'),
         'json': {'ids': library_ids, 'force': force},
         'method': 'POST',
+        'idempotent': True,
         'headers': await get_headers(url=url, apikey=apikey)
     }
 
 
-@http_api(config.headers)
+@authorized_api
 async def jobs(url: str = config.url, apikey: str = config.apikey) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Server/jobs'),
@@ -114,7 +198,7 @@ async def jobs(url: str = config.url, apikey: str = config.apikey) -> dict:
     }
 
 
-@http_api(config.headers, 5)
+@http_api(config.headers, 5, service='kavita', session_options=config.session)
 async def series_cover(series_id: int, method: str = 'GET', url: str = config.url, apikey: str = config.apikey, read_body: bool = False) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/image/series-cover'),
@@ -124,7 +208,7 @@ async def series_cover(series_id: int, method: str = 'GET', url: str = config.ur
     }
 
 
-@http_api(config.headers, 5)
+@http_api(config.headers, 5, service='kavita', session_options=config.session)
 async def volume_cover(volume_id: int, method: str = 'GET', url: str = config.url, apikey: str = config.apikey, read_body: bool = False) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/image/volume-cover'),
@@ -134,11 +218,12 @@ async def volume_cover(volume_id: int, method: str = 'GET', url: str = config.ur
     }
 
 
-@http_api(config.headers)
+@authorized_api
 async def series_refresh_metadata(library_id: int, series_id: int, force: bool = False, color_scape: bool = False, method: str = 'POST', url: str = config.url, apikey: str = config.apikey) -> dict:
     return {
         'url': urllib.parse.urljoin(url, '/api/Series/refresh-metadata'),
         'method': method,
+        'idempotent': True,
         'headers': await get_headers(url=url, apikey=apikey),
         'json': {
             'libraryId': library_id,
@@ -158,6 +243,14 @@ def fetch_all(query: str, params: Sequence[str] | dict[str, str] = ()) -> Genera
         yield row
 
 
+def fetch_all_by_keyset(query: str, params: Sequence[str] | dict[str, str] = (), page_size: int = config.page_size, key: str = 'Id') -> Generator[dict, None, None]:
+    """
+    대량의 행을 조회할 때 사용
+    key 컬럼 기준으로 페이지 단위로 나눠서 조회하므로 전체 결과를 메모리에 올리거나 읽기 커서를 오래 유지하지 않음
+    """
+    yield from fetch_by_keyset(config.db, query, params, page_size=page_size, key=key)
+
+
 @retrieve_db
 def execute(query: str, params: Sequence[str] | dict[str, str] = (), retry_count: int = config.retry, con: sqlite3.Connection = None) -> sqlite3.Cursor:
     for idx in range(retry_count):
@@ -227,6 +320,44 @@ def get_library_by_cover(cover: str, con: sqlite3.Connection = None) -> int:
     return -1
 
 
+def build_cover_index(con: sqlite3.Connection = None) -> dict[str, int]:
+    """
+    커버 파일 이름(경로 제외)으로 LibraryId를 찾는 색인을 생성
+    get_library_by_cover()와 같은 규칙을 적용하지만 테이블마다 한번씩만 읽음
+
+    `l`로 시작하는 커버는 Library 테이블에서만 검색
+    그 외의 커버는 Series, Volume, Chapter 순서로 먼저 검색된 LibraryId를 사용
+    """
+    queries = (
+        "SELECT CoverImage, id FROM Library WHERE CoverImage IS NOT NULL",
+        "SELECT CoverImage, LibraryId FROM Series WHERE CoverImage IS NOT NULL",
+        """
+        SELECT v.CoverImage, s.LibraryId
+        FROM Volume AS v
+        JOIN Series AS s ON v.SeriesId = s.id
+        WHERE v.CoverImage IS NOT NULL
+        """,
+        """
+        SELECT c.CoverImage, s.LibraryId
+        FROM Chapter AS c
+        JOIN Volume AS v ON c.VolumeId = v.id
+        JOIN Series AS s ON v.SeriesId = s.id
+        WHERE c.CoverImage IS NOT NULL
+        """,
+    )
+    index = {}
+    # 행마다 dict를 만들지 않도록 기본 row_factory 사용
+    cursor = con.cursor()
+    cursor.row_factory = None
+    for idx, sql in enumerate(queries):
+        is_library = idx == 0
+        for cover_image, library_id in cursor.execute(sql):
+            name = cover_image.rpartition('/')[2]
+            if name.startswith('l') == is_library:
+                index.setdefault(name, library_id)
+    return index
+
+
 def get_tables_using_cover(cover: str, con: sqlite3.Connection = None) -> list:
     tables = []
     for table in config.tables_with_cover:
@@ -247,12 +378,63 @@ def is_cover_used(cover: str, con: sqlite3.Connection = None) -> bool:
 def should_be_ignored(cover: pathlib.Path) -> bool:
     if cover.is_dir():
         return True
+    return is_ignored_name(cover.name)
+
+
+def is_ignored_name(name: str) -> bool:
     for pattern in config.ignore_cover_patterns:
-        if pattern.search(cover.name):
+        if pattern.search(name):
             return True
     return False
 
 
+def load_used_covers(con: sqlite3.Connection = None) -> set[str]:
+    """tables_with_cover 테이블에서 사용중인 CoverImage 값을 모두 불러옴"""
+    used = set()
+    cursor = con.cursor()
+    cursor.row_factory = None
+    for table in config.tables_with_cover:
+        used.update(row[0] for row in cursor.execute(f'SELECT CoverImage FROM {table} WHERE CoverImage IS NOT NULL'))
+    return used
+
+
+def scan_covers(root_path: pathlib.Path, target_paths: Sequence[pathlib.Path], recursive: bool = True, workers: int = config.workers) -> list[str]:
+    """
+    target_paths 폴더의 커버 파일을 root_path 기준 상대 경로로 반환
+    하위 폴더는 스레드 풀에서 동시에 탐색
+    """
+    def scan(directory: str, prefix: str) -> tuple[list[str], list[tuple[str, str]]]:
+        files = []
+        directories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    directories.append((entry.path, f'{prefix}{entry.name}/'))
+                elif not is_ignored_name(entry.name):
+                    files.append(f'{prefix}{entry.name}')
+        return files, directories
+
+    covers = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        pending = set()
+        for target_path in target_paths:
+            prefix = target_path.relative_to(root_path).as_posix()
+            prefix = '' if prefix == '.' else f'{prefix}/'
+            pending.add(executor.submit(scan, str(target_path), prefix))
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                try:
+                    files, directories = future.result()
+                except OSError as e:
+                    logger.error(f'폴더 탐색 실패: {e}')
+                    continue
+                covers.extend(files)
+                if recursive:
+                    pending.update(executor.submit(scan, *directory) for directory in directories)
+    return covers
+
+
 def print_fails(fails: list[tuple[pathlib.Path, str]]) -> None:
     if not fails:
         return
@@ -261,13 +443,129 @@ def print_fails(fails: list[tuple[pathlib.Path, str]]) -> None:
     logger.info(f'총 개수: {len(fails)}')
 
 
+def attach_journal(con: sqlite3.Connection, journal: str = config.journal) -> None:
+    """
+    커버 이동 기록용 저널 DB를 journal 이라는 이름으로 연결
+    카비타 DB 업데이트와 저널 기록을 같은 트랜잭션으로 처리하기 위해 사용
+    """
+    if not con.execute("SELECT 1 FROM pragma_database_list WHERE name = 'journal'").fetchone():
+        con.execute('ATTACH DATABASE ? AS journal', (journal,))
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS journal.cover_moves (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT NOT NULL,
+            target TEXT NOT NULL,
+            old_value TEXT NOT NULL,
+            new_value TEXT NOT NULL,
+            state TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS journal.cover_moves_state ON cover_moves (state);
+    """)
+
+
+def set_move_state(con: sqlite3.Connection, move_ids: Sequence[int], state: str) -> None:
+    con.executemany(
+        'UPDATE journal.cover_moves SET state = ?, updated_at = ? WHERE id = ?',
+        ((state, time.time(), move_id) for move_id in move_ids)
+    )
+
+
+def get_partial_path(path: pathlib.Path) -> pathlib.Path:
+    return path.with_name(f'{path.name}.part')
+
+
+def move_cover(path: pathlib.Path, new_path: pathlib.Path) -> None:
+    try:
+        path.rename(new_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # 다른 장치(마운트)일 경우 임시 파일로 복사 후 크기를 확인하고 원본을 삭제
+        partial = get_partial_path(new_path)
+        try:
+            shutil.copy2(path, partial)
+            if partial.stat().st_size != path.stat().st_size:
+                raise OSError(f'복사한 파일의 크기가 다릅니다: {partial}')
+            partial.replace(new_path)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        path.unlink()
+
+
+def commit_moves(con: sqlite3.Connection, moves: Sequence[tuple[int, str, str]]) -> None:
+    """이동이 끝난 커버의 DB 업데이트와 저널의 완료 표시를 하나의 트랜잭션으로 실행"""
+    if not moves:
+        return
+    with con:
+        for table in config.tables_with_cover:
+            con.executemany(
+                f'UPDATE {table} SET CoverImage = ? WHERE CoverImage = ?',
+                ((new_value, old_value) for _, old_value, new_value in moves)
+            )
+        set_move_state(con, [move_id for move_id, _, _ in moves], 'committed')
+
+
+def move_covers(con: sqlite3.Connection, plans: Sequence[tuple[pathlib.Path, pathlib.Path, str]], workers: int = config.workers) -> list[tuple[pathlib.Path, str]]:
+    """
+    1. 이동할 커버를 저널에 pending 상태로 기록
+    2. 파일 이동. 대상 폴더를 먼저 생성한 후 workers 개의 스레드로 동시에 이동
+    3. 이동한 커버의 DB 업데이트 및 저널에 committed 표시
+    2 ~ 3 사이에 중단되면 recover_organized_covers()로 복구
+    """
+    now = time.time()
+    with con:
+        move_ids = [
+            con.execute(
+                "INSERT INTO journal.cover_moves (source, target, old_value, new_value, state, created_at, updated_at) VALUES (?, ?, ?, ?, 'pending', ?, ?)",
+                (str(path), str(new_path), path.name, new_value, now, now)
+            ).lastrowid
+            for path, new_path, new_value in plans
+        ]
+    # 대상 폴더별로 한번씩만 생성
+    for parent in {new_path.parent for _, new_path, _ in plans}:
+        if not parent.exists():
+            logger.debug(f'Create: {parent}')
+            parent.mkdir(parents=True, exist_ok=True)
+
+    def move(plan: tuple[pathlib.Path, pathlib.Path, str]) -> Exception | None:
+        try:
+            move_cover(plan[0], plan[1])
+        except Exception as e:
+            logger.exception(f'커버 정리 실패: {plan[0].name}')
+            return e
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        errors = list(executor.map(move, plans))
+    fails = []
+    failed_ids = []
+    moves = []
+    # DB 업데이트는 이동에 성공한 커버만 원래 순서대로 적용
+    for move_id, (path, new_path, new_value), error in zip(move_ids, plans, errors):
+        if error:
+            fails.append((path, str(error)))
+            failed_ids.append(move_id)
+        else:
+            moves.append((move_id, path.name, new_value))
+    commit_moves(con, moves)
+    with con:
+        set_move_state(con, failed_ids, 'failed')
+    logger.info(f'DB 업데이트: {len(moves)} 개')
+    return fails
+
+
 @retrieve_db
-def organize_covers(covers: str = '/kavita/config/covers', quantity: int = -1, sub_path: str = None, dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
+def organize_covers(covers: str = '/kavita/config/covers', quantity: int = -1, sub_path: str = None, batch_size: int = config.batch_size, workers: int = config.workers, dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
     """커버 이미지를 각 라이브러리 폴더로 이동. 하위 폴더는 검색하지 않음. 데이터베이스에서 커버 이미지로 라이브러리 ID를 검색한 후 그 ID로 폴더를 생성하여 이동.
+    이동 내역은 저널(config.journal)에 기록하고 batch_size 개의 파일마다 DB 업데이트를 하나의 트랜잭션으로 실행
     Args:
         covers: 커버 폴더 경로
         quantity: 옮길 파일 갯수를 정해서 부분 실행. 모든 파일: -1
         sub_path: 이동할 하위 폴더 이름. covers 폴더 아래에 생성
+        batch_size: 한 트랜잭션으로 DB를 업데이트할 파일 개수. config.yaml 설정을 기본값으로 사용
+        workers: 파일 이동을 동시에 실행할 스레드 개수. 리모트 경로(마운트)로 이동할 경우 늘려서 사용. config.yaml 설정을 기본값으로 사용
         dry_run: 실제 실행 여부. config.yaml 설정을 기본값으로 사용
         con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
 
@@ -278,53 +576,157 @@ def organize_covers(covers: str = '/kavita/config/covers', quantity: int = -1, s
         >>> organize_covers('/kavita/config/covers', quantity=100, sub_path='google', dry_run=True)
     """
     path_covers = pathlib.Path(covers)
+    if not dry_run:
+        attach_journal(con)
+        pending = con.execute("SELECT COUNT(*) AS count FROM journal.cover_moves WHERE state = 'pending'").fetchone()
+        if pending['count']:
+            logger.error(f'완료되지 않은 이동 기록이 있습니다: {pending["count"]} 개. recover_organized_covers()를 먼저 실행하세요.')
+            return
     fails = []
     library_ids = set()
     counter = 0
-    for path in path_covers.glob('*'):
-        if should_be_ignored(path):
-            # 디렉토리, 공통으로 사용하는 커버는 제외
-            continue
-        library_id = get_library_by_cover(f'%{path.name}', con=con)
-        if library_id < 1:
-            # 라이브러리를 알 수 없는 커버는 제외
-            continue
-        if quantity >= 0 and quantity <= counter:
-            break
-        counter += 1
-        library_ids.add(library_id)
-        if sub_path:
-            new_path = path_covers / sub_path / f'{library_id}' / path.name
-        else:
-            new_path = path_covers / f'{library_id}' / path.name
-        try:
-            if not dry_run and not new_path.parent.exists():
-                logger.debug(f'Create: {new_path.parent}')
-                new_path.parent.mkdir(parents=True)
-            logger.info(f'{path} -> {new_path}')
-            if not dry_run:
-                try:
-                    path.rename(new_path)
-                except OSError as e:
-                    if e.errno == 18:
-                        #logger.warning(f"Cross-device link detected, falling back to shutil.move: {e}")
-                        shutil.move(path, new_path)
-                    else:
-                        raise
+    start = time.time()
+    cover_index = build_cover_index(con=con)
+    logger.info(f'커버 색인 생성: {len(cover_index)} 개, {time.time() - start:.1f}s')
+    plans = []
+    try:
+        for path in path_covers.glob('*'):
+            if should_be_ignored(path):
+                # 디렉토리, 공통으로 사용하는 커버는 제외
+                continue
+            library_id = cover_index.get(path.name, -1)
+            if library_id < 1:
+                # 라이브러리를 알 수 없는 커버는 제외
+                continue
+            if quantity >= 0 and quantity <= counter:
+                break
+            counter += 1
+            library_ids.add(library_id)
+            if sub_path:
+                new_path = path_covers / sub_path / f'{library_id}' / path.name
+            else:
+                new_path = path_covers / f'{library_id}' / path.name
             new_value = str(new_path.relative_to(path_covers))
-            logger.info(f'Update CoverImage with {new_value}')
-            if not dry_run:
-                for table in config.tables_with_cover:
-                    con.execute(f'UPDATE {table} SET CoverImage = ? WHERE CoverImage = ?', (new_value, path.name))
-        except KeyboardInterrupt as e:
-            logger.exception(f'사용자 중단: {path}')
-            break
-        except Exception as e:
-            logger.exception(f'커버 정리 실패: {path.name}')
-            fails.append((path, str(e)))
+            logger.info(f'{path} -> {new_path}')
+            if dry_run:
+                continue
+            plans.append((path, new_path, new_value))
+            if len(plans) >= batch_size:
+                fails.extend(move_covers(con, plans, workers=workers))
+                plans = []
+        if plans:
+            fails.extend(move_covers(con, plans, workers=workers))
+    except KeyboardInterrupt as e:
+        logger.exception(f'사용자 중단: 완료되지 않은 이동은 recover_organized_covers()로 복구하세요.')
     print_fails(fails)
 
 
+@retrieve_db
+def recover_organized_covers(mode: str = 'replay', dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
+    """organize_covers() 실행 중 중단되어 저널에 pending 상태로 남은 커버 이동을 복구
+    Args:
+        mode:
+            replay: 이동이 끝난 파일은 DB 업데이트를 적용
+            rollback: 이동이 끝난 파일을 원래 위치로 되돌리고 DB 값도 되돌림
+            이동이 끝나지 않은 파일은 두 방식 모두 원래 위치에 남기고 이동 대상 경로의 파일을 삭제
+        dry_run: 실제 실행 여부. config.yaml 설정을 기본값으로 사용
+        con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
+
+    Returns:
+        None:
+
+    Examples:
+        >>> recover_organized_covers('replay', dry_run=True)
+    """
+    if mode not in ('replay', 'rollback'):
+        raise Exception(f'mode 값을 확인하세요: {mode}')
+    attach_journal(con)
+    rows = con.execute("SELECT * FROM journal.cover_moves WHERE state = 'pending' ORDER BY id").fetchall()
+    logger.info(f'완료되지 않은 이동 기록: {len(rows)} 개')
+    for row in rows:
+        source = pathlib.Path(row['source'])
+        target = pathlib.Path(row['target'])
+        try:
+            if source.exists():
+                # 이동 전 혹은 복사 도중 중단
+                logger.info(f'이동 취소: {source}')
+                if not dry_run:
+                    if target.exists():
+                        target.unlink()
+                    get_partial_path(target).unlink(missing_ok=True)
+                    with con:
+                        set_move_state(con, (row['id'],), 'rolled_back')
+            elif not target.exists():
+                logger.error(f'파일을 찾을 수 없습니다: {source} {target}')
+                if not dry_run:
+                    with con:
+                        set_move_state(con, (row['id'],), 'failed')
+            elif mode == 'replay':
+                logger.info(f'DB 업데이트: {row["old_value"]} -> {row["new_value"]}')
+                if not dry_run:
+                    commit_moves(con, ((row['id'], row['old_value'], row['new_value']),))
+            else:
+                logger.info(f'되돌리기: {target} -> {source}')
+                if not dry_run:
+                    move_cover(target, source)
+                    with con:
+                        for table in config.tables_with_cover:
+                            con.execute(f'UPDATE {table} SET CoverImage = ? WHERE CoverImage = ?', (row['old_value'], row['new_value']))
+                        set_move_state(con, (row['id'],), 'rolled_back')
+        except Exception as e:
+            logger.exception(f'복구 실패: {row}')
+
+
+# CoverImage 에서 마지막 '/' 이후의 파일 이름
+COVER_BASENAME_SQL = "substr(CoverImage, length(rtrim(CoverImage, replace(CoverImage, '/', ''))) + 1)"
+
+# 라이브러리에 속한 레코드를 찾는 테이블별 조건
+LIBRARY_COVER_SCOPES = {
+    'Library': 'Id = :library_id',
+    'Series': 'LibraryId = :library_id',
+    'Volume': 'SeriesId IN (SELECT Id FROM Series WHERE LibraryId = :library_id)',
+    'Chapter': """VolumeId IN (
+        SELECT v.Id
+        FROM Volume AS v
+        JOIN Series AS s ON v.SeriesId = s.Id
+        WHERE s.LibraryId = :library_id
+    )""",
+}
+
+
+def parse_ids(ids: Sequence[int] | str) -> tuple[int]:
+    if isinstance(ids, str):
+        ids = ids.split(',')
+    return tuple(int(id_) for id_ in ids if str(id_).strip())
+
+
+def rewrite_library_covers(con: sqlite3.Connection, library_ids: Sequence[int] | str, new_value: str, condition: str, params: dict, dry_run: bool = config.dry_run) -> None:
+    """
+    라이브러리에 속한 레코드의 CoverImage 값을 테이블별 UPDATE 한번으로 변경
+    변경될 개수를 먼저 출력한 후 모든 UPDATE를 하나의 트랜잭션으로 실행
+
+    new_value: 새 CoverImage 값을 계산하는 SQL 표현식
+    condition: 변경할 레코드의 조건
+    """
+    updates = []
+    for library_id in parse_ids(library_ids):
+        values = {**params, 'library_id': library_id}
+        for table, scope in LIBRARY_COVER_SCOPES.items():
+            where = f'{scope} AND {condition} AND CoverImage != ({new_value})'
+            count = con.execute(f'SELECT COUNT(*) AS count FROM {table} WHERE {where}', values).fetchone()['count']
+            logger.info(f'Update: library={library_id} table={table} count={count}')
+            if not count:
+                continue
+            for row in con.execute(f'SELECT CoverImage, ({new_value}) AS NewCoverImage FROM {table} WHERE {where} LIMIT 5', values):
+                logger.debug(f'{table}: {row["CoverImage"]} -> {row["NewCoverImage"]}')
+            updates.append((f'UPDATE {table} SET CoverImage = ({new_value}) WHERE {where}', values))
+    if dry_run or not updates:
+        return
+    with con:
+        total = sum(con.execute(query, values).rowcount for query, values in updates)
+    logger.info(f'Updated: {total}')
+
+
 @retrieve_db
 def fix_organized_covers(library_ids: Sequence[int] | str = (), covers: str = '/kavita/config/covers', sub_path: str = None, cover_image_like: str = '%.png', dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
     """커버 파일은 이동 되었는데 DB 업데이트가 안 됐을 경우 실행
@@ -344,48 +746,30 @@ def fix_organized_covers(library_ids: Sequence[int] | str = (), covers: str = '/
     Examples:
         >>> fix_organized_covers([101, 102, 103], covers='/mnt/kavita/covers', sub_path='google', dry_run=True)
     """
-    query_select = "SELECT Id, CoverImage FROM {table} WHERE CoverImage LIKE ?"
-    query_update = "UPDATE {table} SET CoverImage = ? WHERE Id = ?"
-    path_covers = pathlib.Path(covers)
-
-    def update_cover(table: str, library_id: int, row: dict) -> None:
-        try:
-            if not row:
-                return
-            cover_image = row.get('CoverImage') or ''
-            path_image = pathlib.Path(cover_image)
-            new_path = path_covers
-            if sub_path:
-                new_path = new_path / sub_path
-            new_path = new_path / str(library_id) / path_image.name
-            if should_be_ignored(new_path):
-                return
-            relative_path = new_path.relative_to(path_covers)
-            logger.info(f'Update: {cover_image} -> {relative_path}')
-            if not dry_run:
-                con.execute(query_update.format(table=table), (str(relative_path), row['Id']))
-        except Exception as e:
-            logger.exception(f'{table}: {row["Id"]}')
-
-    for library_id in library_ids:
-        lib_row = con.execute(f"{query_select.format(table='Library')} AND Id = ?", (cover_image_like, library_id)).fetchone()
-        update_cover('Library', library_id, lib_row)
-        for row in con.execute(f"{query_select.format(table='Series')} AND LibraryId = ?", (cover_image_like, library_id)).fetchall():
-            update_cover('Series', library_id, row)
-            for vol_row in con.execute(f"{query_select.format(table='Volume')} AND SeriesId = ?", (cover_image_like, row['Id'])).fetchall():
-                update_cover('Volume', library_id, vol_row)
-                for ch_row in con.execute(f"{query_select.format(table='Chapter')} AND VolumeId = ?", (cover_image_like, vol_row['Id'])).fetchall():
-                    update_cover('Chapter', library_id, ch_row)
+    if sub_path:
+        new_value = f":sub_path || '/' || :library_id || '/' || {COVER_BASENAME_SQL}"
+    else:
+        new_value = f":library_id || '/' || {COVER_BASENAME_SQL}"
+    con.create_function('is_ignored_cover', 1, lambda value: is_ignored_name(value.rpartition('/')[2]) if value else False, deterministic=True)
+    rewrite_library_covers(
+        con,
+        library_ids,
+        new_value,
+        'CoverImage LIKE :like AND NOT is_ignored_cover(CoverImage)',
+        {'like': cover_image_like, 'sub_path': (sub_path or '').strip('/')},
+        dry_run=dry_run,
+    )
 
 
 @retrieve_db
-def clean_covers(covers: str = '/kavita/config/covers', subs: Sequence[str] = (), recursive: bool = True, dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
+def clean_covers(covers: str = '/kavita/config/covers', subs: Sequence[str] = (), recursive: bool = True, dry_run: bool = config.dry_run, workers: int = config.workers, con: sqlite3.Connection = None) -> None:
     """데이터베이스에서 커버 이미지를 사용중인 레코드가 없으면 삭제
     Args:
         covers: 커버 폴더 경로
         sub: covers의 하위 폴더 이름. 특정 폴더만 정리하고 싶을 경우 지정
         recursive: 하위 폴더 탐색 여부
         dry_run: 실제 실행 여부. config.yaml의 값을 기본값으로 사용
+        workers: 폴더 탐색 및 파일 삭제를 동시에 실행할 스레드 개수. config.yaml의 값을 기본값으로 사용
         con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
 
     Returns:
@@ -407,61 +791,296 @@ def clean_covers(covers: str = '/kavita/config/covers', subs: Sequence[str] = ()
     if not target_paths:
         target_paths.append(root_path)
 
-    fails = []
-    for target_path in target_paths:
-        for path in target_path.rglob('*') if recursive else target_path.glob('*'):
-            if should_be_ignored(path):
-                continue
-            search_path = str(path.relative_to(root_path))
-            logger.debug(f'Search: {search_path}')
-            if is_cover_used(search_path, con=con):
-                continue
-            logger.info(f'Remove: {path}')
-            if not dry_run:
-                try:
-                    path.unlink()
-                except Exception as e:
-                    logger.exception(f'삭제 실패: {path}')
-                    fails.append((path, str(e)))
+    start = time.time()
+    start_mem = mem_usage()
+    used = load_used_covers(con=con)
+    logger.info(f'사용중인 커버: {len(used)} 개, {time.time() - start:.1f}s')
+    covers = scan_covers(root_path, target_paths, recursive=recursive, workers=workers)
+    logger.info(f'커버 파일: {len(covers)} 개, {time.time() - start:.1f}s')
+    orphans = sorted(set(covers) - used)
+    del covers, used
+    logger.info(f'사용되지 않는 커버: {len(orphans)} 개, {time.time() - start:.1f}s, 메모리 변동: {mem_usage() - start_mem:.1f}MB')
+
+    def remove(orphan: str) -> tuple[pathlib.Path, str] | None:
+        path = root_path / orphan
+        logger.info(f'Remove: {path}')
+        if dry_run:
+            return
+        try:
+            path.unlink()
+        except Exception as e:
+            logger.exception(f'삭제 실패: {path}')
+            return path, str(e)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        fails = [fail for fail in executor.map(remove, orphans) if fail]
     print_fails(fails)
+    logger.info(f'커버 정리 완료: {len(orphans) - len(fails)} 개, {time.time() - start:.1f}s')
 
 
 def is_series_updated(series_id: int, start: float) -> bool:
-    # 정확하지 않음
-    timestmap_format = '%Y-%m-%d %H:%M:%S.%f%z'
-    row = execute("SELECT * FROM Series WHERE Id = ?", (series_id,)).fetchone()
+    row = fetch_one("SELECT LastFolderScannedUtc, LastModifiedUtc FROM Series WHERE Id = ?", (series_id,))
     if not row:
         logger.error(f'No series found: {series_id}')
         return True
-    last_scanned = datetime.datetime.strptime(f"{row['LastFolderScannedUtc'][:-1]}+0000", timestmap_format).timestamp()
-    last_modified = datetime.datetime.strptime(f"{row['LastModifiedUtc'][:-1]}+0000", timestmap_format).timestamp()
-    return max(last_modified, last_scanned) > start
+    return get_series_updated(row) > start
+
 
+# fromisoformat()이 처리하지 못 하는 7자리 소수점 초, Z 표기 등을 정리
+KAVITA_TIMESTAMP = re.compile(r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:\.(\d{1,6})\d*)?(Z|[+-]\d{2}:?\d{2})?$')
 
-async def scan_series_by_query(query: str, params: Sequence[str] | dict[str, str] = (), interval: int | float = 30.0, check: int | float = 5.0, force: bool = False) -> None:
+
+def parse_kavita_timestamp(value: str | None) -> float | None:
+    """
+    카비타의 UTC 시각 문자열을 epoch 초로 변환
+
+    Args:
+        value: `2024-01-02 03:04:05.1234567`, `2024-01-02T03:04:05Z` 형식의 문자열
+
+    Returns:
+        epoch 초. 변환할 수 없으면 `None`
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        if not (match := KAVITA_TIMESTAMP.match(value)):
+            logger.debug(f'시각 형식 확인: {value}')
+            return None
+        date, time_, fraction, zone = match.groups()
+        zone = '+00:00' if zone in (None, 'Z') else zone
+        parsed = datetime.datetime.fromisoformat(f'{date}T{time_}.{(fraction or "0").ljust(6, "0")}{zone}')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def get_series_updated(row: dict) -> float:
+    return max(parse_kavita_timestamp(row['LastFolderScannedUtc']) or 0, parse_kavita_timestamp(row['LastModifiedUtc']) or 0)
+
+
+class SeriesUpdatePoller:
+    """
+    여러 시리즈의 갱신 여부를 하나의 작업에서 확인
+
+    대기 중인 시리즈를 `WHERE Id IN (...)` 쿼리 하나로 확인하고 갱신된 시리즈를 기다리는 코루틴을 깨움.
+    """
+
+    def __init__(self, check: int | float = 5.0, chunk_size: int = 500) -> None:
+        """
+        Args:
+            check: 확인 주기 (초)
+            chunk_size: 한 번의 쿼리로 확인할 시리즈 수
+        """
+        self.check = check
+        self.chunk_size = chunk_size
+        self._waiters: dict[int, list[tuple[float, asyncio.Future]]] = {}
+        self._checks: dict[asyncio.Future, float] = {}
+        self._task: asyncio.Task = None
+
+    async def wait(self, series_id: int, start: float, timeout: int | float = None, check: int | float = None) -> bool:
+        """
+        시리즈가 `start` 이후에 갱신될 때까지 대기
+
+        Args:
+            series_id: 시리즈 ID
+            start: 기준 시각 (epoch 초)
+            timeout: 최대 대기 시간 (초). `None`이면 무제한
+            check: 확인 주기 (초). 대기 중인 요청 중 가장 짧은 주기로 확인함
+
+        Returns:
+            제한 시간 내에 갱신됐는지 여부
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(series_id, []).append((start, future))
+        self._checks[future] = check or self.check
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._checks.pop(future, None)
+            waiters = [waiter for waiter in self._waiters.get(series_id, ()) if waiter[1] is not future]
+            if waiters:
+                self._waiters[series_id] = waiters
+            else:
+                self._waiters.pop(series_id, None)
+
+    async def run(self) -> None:
+        while self._waiters:
+            await asyncio.sleep(min(self._checks.values(), default=self.check))
+            try:
+                self.poll()
+            except Exception as e:
+                logger.exception(f'시리즈 갱신 확인 실패: {e}')
+
+    def poll(self) -> None:
+        ids = tuple(self._waiters)
+        if not ids:
+            return
+        logger.debug(f'시리즈 갱신 대기 중: {len(ids)}')
+        rows = {}
+        for idx in range(0, len(ids), self.chunk_size):
+            chunk = ids[idx:idx + self.chunk_size]
+            query = f'SELECT Id, LastFolderScannedUtc, LastModifiedUtc FROM Series WHERE Id IN ({", ".join("?" * len(chunk))})'
+            rows.update((row['Id'], row) for row in fetch_all(query, chunk))
+        for series_id in ids:
+            if series_id in rows:
+                updated = get_series_updated(rows[series_id])
+            else:
+                logger.error(f'No series found: {series_id}')
+                updated = float('inf')
+            for start, future in self._waiters.get(series_id, ()):
+                if not future.done() and updated > start:
+                    future.set_result(True)
+
+
+series_updates = SeriesUpdatePoller()
+
+
+class ScanDispatcher:
+    """
+    카비타의 스캔 작업이 한가할 때 다음 시리즈 스캔을 요청
+
+    `/api/Server/jobs`는 반복 작업의 마지막 실행 시각만 알려주므로 스캔 작업이 최근에 실행됐으면 진행 중으로 간주하고,
+    직접 요청한 스캔은 시리즈의 갱신 시각으로 완료 여부를 확인함.
+    관찰한 스캔 소요 시간의 지수 이동 평균으로 확인 주기와 진행 중 판단 기간을 조절함.
+    """
+
+    def __init__(self, check: int | float = 5.0, cooldown: int | float = 0.0, timeout: int | float = 600.0, alpha: float = 0.3, url: str = config.url, apikey: str = config.apikey) -> None:
+        """
+        Args:
+            check: 확인 주기의 기본값 (초)
+            cooldown: 스캔 완료 후 다음 스캔 요청까지 추가로 기다릴 시간 (초)
+            timeout: 스캔 완료를 기다릴 최대 시간 (초)
+            alpha: 소요 시간 이동 평균의 가중치
+            url: 카비타 URL
+            apikey: 카비타 API 키
+        """
+        self.check = check
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self.alpha = alpha
+        self.url = url
+        self.apikey = apikey
+        self.estimate: float = None
+        self.started_at: float = None
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'timeouts': 0}
+        self._lock: asyncio.Lock = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    @property
+    def poll_interval(self) -> float:
+        # 평균 소요 시간의 1/5 간격으로 확인하되 1초에서 check의 6배 사이로 제한
+        if self.estimate is None:
+            return self.check
+        return min(max(self.estimate / 5, 1.0), self.check * 6)
+
+    def record_duration(self, duration: float) -> None:
+        if self.estimate is None:
+            self.estimate = duration
+        else:
+            self.estimate = self.alpha * duration + (1 - self.alpha) * self.estimate
+
+    async def is_kavita_busy(self) -> bool:
+        result = await jobs(url=self.url, apikey=self.apikey)
+        if not 300 > (result.get('status_code') or 0) > 199:
+            logger.warning(f'작업 목록 확인 실패: status_code={result.get("status_code")}')
+            return False
+        window = max(self.estimate or 0, self.check)
+        now = time.time()
+        for job in result.get('json') or ():
+            name = f'{job.get("id")} {job.get("title")}'.lower()
+            if 'scan' not in name:
+                continue
+            last_execution = parse_kavita_timestamp(job.get('lastExecutionUtc') or job.get('lastExecution'))
+            if last_execution and now - last_execution < window:
+                logger.debug(f'카비타 스캔 작업 진행 중: {job.get("title")}')
+                return True
+        return False
+
+    async def wait_until_idle(self) -> None:
+        while await self.is_kavita_busy():
+            await asyncio.sleep(self.poll_interval)
+
+    async def wait_for_update(self, series_id: int, start: float) -> bool:
+        return await series_updates.wait(series_id, start, timeout=self.timeout, check=self.poll_interval)
+
+    async def submit(self, library_id: int, series_id: int, force: bool = False, colorscape: bool = False) -> bool:
+        """
+        카비타가 한가해지면 시리즈 스캔을 요청하고 완료될 때까지 대기
+
+        Args:
+            library_id: 라이브러리 ID
+            series_id: 시리즈 ID
+            force: 강제 업데이트 여부
+            colorscape: colorscape 갱신 여부
+
+        Returns:
+            제한 시간 내에 스캔이 완료됐는지 여부
+        """
+        async with self.lock:
+            await self.wait_until_idle()
+            if self.started_at is None:
+                self.started_at = time.time()
+            start = time.time()
+            logger.info(f'Scan: {series_id}')
+            result = await scan_series(series_id, library_id=library_id, force=force, colorscape=colorscape, url=self.url, apikey=self.apikey)
+            if not 300 > (result.get('status_code') or 0) > 199:
+                self.stats['failed'] += 1
+                logger.error(f'시리즈 스캔 실패: {series_id=} status_code={result.get("status_code")}')
+                return False
+            self.stats['submitted'] += 1
+            if not await self.wait_for_update(series_id, start):
+                self.stats['timeouts'] += 1
+                logger.warning(f'스캔 완료 대기 시간 초과: {series_id}')
+                return False
+            self.stats['completed'] += 1
+            self.record_duration(time.time() - start)
+            logger.debug(f'Series updated: {series_id} {self.metrics()}')
+            if self.cooldown > 0:
+                await asyncio.sleep(self.cooldown)
+            return True
+
+    def metrics(self) -> dict[str, int | float]:
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        return {
+            **self.stats,
+            'average_duration': round(self.estimate or 0, 2),
+            'per_minute': round(self.stats['completed'] / (elapsed / 60), 2) if elapsed > 0 else 0,
+        }
+
+
+async def scan_series_by_query(query: str, params: Sequence[str] | dict[str, str] = (), interval: int | float = 0.0, check: int | float = 5.0, force: bool = False, timeout: int | float = 600.0) -> None:
     """쿼리문으로 시리즈 스캔
+
+    카비타의 스캔 작업이 한가해지면 다음 시리즈를 스캔함.
     Args:
         query: 쿼리문
         params: 쿼리문 매개변수
-        interval: 각 시리즈 스캔 간격 (초)
-        check: 업데이트 확인 대기 시간 (초)
+        interval: 스캔 완료 후 다음 스캔까지 추가로 기다릴 시간 (초)
+        check: 작업 및 업데이트 확인 주기의 기본값 (초)
         force: 강제 업데이트 여부
+        timeout: 각 시리즈의 스캔 완료를 기다릴 최대 시간 (초)
     Returns:
         None:
     Examples:
-        >>> scan_series_by_query('SELECT * FROM Series WHERE CoverImage NOT LIKE ?', ('12345/%',), interval=60, check=6, force=True)
+        >>> scan_series_by_query('SELECT * FROM Series WHERE CoverImage NOT LIKE ?', ('12345/%',), check=6, force=True)
     """
+    dispatcher = ScanDispatcher(check=check, cooldown=interval, timeout=timeout)
+    # 스캔 중에 카비타가 DB에 쓸 수 있도록 대상을 먼저 읽어 둠
     targets = tuple(fetch_all(query, params))
-    last_index = len(targets) - 1
-    for idx, row in enumerate(targets):
-        start = datetime.datetime.now(datetime.timezone.utc).timestamp()
-        logger.info(f'Scan: {row["Id"]}')
-        result = await scan_series(row['Id'], library_id=row['LibraryId'], force=force)
-        while not is_series_updated(row['Id'], start):
-            logger.debug(f'Waiting for update: {row["Id"]}')
-            await asyncio.sleep(check)
-        if idx < last_index:
-            await asyncio.sleep(interval)
+    for row in targets:
+        await dispatcher.submit(row['LibraryId'], row['Id'], force=force)
+    logger.info(f'시리즈 스캔 완료: {dispatcher.metrics()}')
 
 
 async def refresh_series(library_id: int, series_id: int, method: str = 'POST', force: bool = False, color_scape: bool = False, url: str = config.url, apikey: str = config.apikey, check: int | float = 5.0,) -> None:
@@ -469,16 +1088,16 @@ async def refresh_series(library_id: int, series_id: int, method: str = 'POST',
     logger.info(f'시리즈 새로고침: {series_id}')
     result = await series_refresh_metadata(library_id, series_id, method=method, force=force, color_scape=color_scape, url=url, apikey=apikey)
     if 300 > result.get('status_code') > 199:
-        while not is_series_updated(series_id, start):
-            logger.debug(f'시리즈 새로고침 대기중: {series_id}')
-            await asyncio.sleep(check)
+        await series_updates.wait(series_id, start, check=check)
     else:
         logger.error(f'시리즈 새로고침 실패: {series_id=} status_code={result.get("status_code")}')
 
 
-async def series_scan_worker(scan_queue: asyncio.Queue, interval: int = 60, check: int = 5, dry_run: bool = config.dry_run) -> None:
+async def series_scan_worker(scan_queue: asyncio.Queue, interval: int = 0, check: int = 5, dry_run: bool = config.dry_run, dispatcher: ScanDispatcher = None) -> None:
     scanning = set()
     scanned = set()
+    # 카비타는 스캔이 겹치면 10분 지연시키므로 한가할 때 다음 스캔을 요청
+    dispatcher = dispatcher or ScanDispatcher(check=check, cooldown=interval)
 
     while True:
         library_id, series_id = await scan_queue.get()
@@ -489,65 +1108,96 @@ async def series_scan_worker(scan_queue: asyncio.Queue, interval: int = 60, chec
         scanning.add(series_id)
         try:
             if not dry_run:
-                #start = datetime.datetime.now(datetime.timezone.utc).timestamp()
-                logger.info(f'Scan: {series_id}')
-                result = await scan_series(series_id, library_id=library_id, force=True)
-                if not 300 > result.get('status_code') > 199:
-                    logger.error(f'시리즈 스캔 실패: {series_id=} status_code={result.get("status_code")}')
-                # 그냥 기다리지 말고 카비타가 알아서 처리하도록...
-                #while not is_series_updated(series_id, start):
-                #    logger.debug(f'Waiting for update: {series_id}')
-                #    await asyncio.sleep(check)
-                #logger.debug(f"Sereis updated: {series_id}")
-                ## 다음 스캔이 바로 시작되면 10분 딜레이 될 수 있으므로 여유를 주고 시작되도록...
-                #await asyncio.sleep(interval)
+                await dispatcher.submit(library_id, series_id, force=True)
+                scanned.add(series_id)
+        except Exception as e:
+            logger.exception(f'시리즈 스캔 실패: {series_id=} {e}')
         finally:
             scanning.remove(series_id)
             scan_queue.task_done()
 
 
-async def check_cover_image(row: sqlite3.Row, scan_queue: asyncio.Queue, url: str = config.url, apikey: str = config.apikey) -> None:
+# 이미지 API가 HEAD 요청을 지원하는지 여부. 405 응답을 받으면 GET 요청으로 전환
+head_supported = {}
+
+
+async def is_cover_available(cover_api: Callable, item_id: int, url: str = config.url, apikey: str = config.apikey) -> bool:
+    name = cover_api.__name__
+    if head_supported.get(name, True):
+        result = await cover_api(item_id, method='HEAD', url=url, apikey=apikey)
+        if result.get('status_code') != 405:
+            return 300 > result.get('status_code') > 199
+        logger.debug(f'HEAD 요청을 지원하지 않음: {name}')
+        head_supported[name] = False
+    result = await cover_api(item_id, read_body=False, url=url, apikey=apikey)
+    return 300 > result.get('status_code') > 199
+
+
+async def check_cover_image(row: sqlite3.Row, scan_queue: asyncio.Queue, semaphore: asyncio.Semaphore = None, url: str = config.url, apikey: str = config.apikey) -> None:
+    """
+    시리즈 커버를 확인한 후 볼륨 커버를 동시에 확인. 하나라도 비정상이면 나머지 확인은 취소
+    semaphore: 모든 확인 작업이 공유하는 HTTP 요청 동시 실행 개수 제한
+    """
     cover_image = row.get('CoverImage')
     library_id = row['LibraryId']
     series_id = row['Id']
-    is_normal = True
+    semaphore = semaphore or asyncio.Semaphore(1)
 
-    if cover_image:
-        result = await series_cover(series_id, read_body=False, url=url, apikey=apikey)
-        is_normal = True if 300 > result.get('status_code') > 199 else False
-    else:
-        is_normal = False
+    async def check(cover_api: Callable, item_id: int) -> bool:
+        async with semaphore:
+            return await is_cover_available(cover_api, item_id, url=url, apikey=apikey)
 
-    if is_normal:
-        for vol_row in fetch_all(f'SELECT Id, CoverImage, SeriesId FROM Volume WHERE SeriesId = ?', (series_id,)):
-            vol_cover_image = vol_row.get('CoverImage')
-            volume_id = vol_row['Id']
+    is_normal = bool(cover_image) and await check(series_cover, series_id)
 
-            if vol_cover_image:
-                result = await volume_cover(volume_id, read_body=False, url=url, apikey=apikey)
-                is_normal = True if 300 > result.get('status_code') > 199 else False
-            else:
-                is_normal = False
+    if is_normal:
+        volumes = tuple(fetch_all(f'SELECT Id, CoverImage, SeriesId FROM Volume WHERE SeriesId = ?', (series_id,)))
+        if not all(vol_row.get('CoverImage') for vol_row in volumes):
+            is_normal = False
+        else:
+            tasks = [asyncio.create_task(check(volume_cover, vol_row['Id'])) for vol_row in volumes]
+            try:
+                for future in asyncio.as_completed(tasks):
+                    if not await future:
+                        is_normal = False
+                        break
+            finally:
+                for task in tasks:
+                    task.cancel()
 
     if not is_normal:
         logger.info(f"비정상 커버: {url}/library/{library_id}/series/{series_id}")
         await scan_queue.put((library_id, series_id))
 
 
-async def scan_no_cover(library_id: int | None = None, semaphore: int = 10, dry_run: bool = config.dry_run, url: str = config.url, apikey: str = config.apikey) -> None:
+async def cover_check_worker(queue: asyncio.Queue, name: str, scan_queue: asyncio.Queue, semaphore: asyncio.Semaphore, url: str = config.url, apikey: str = config.apikey) -> None:
+    while True:
+        row = await queue.get()
+        if row is None:
+            queue.task_done()
+            break
+        try:
+            await check_cover_image(row, scan_queue, semaphore=semaphore, url=url, apikey=apikey)
+        except Exception:
+            logger.exception(f'커버 확인 실패({name}): {row}')
+        finally:
+            queue.task_done()
+
+
+async def scan_no_cover(library_id: int | None = None, semaphore: int = 10, dry_run: bool = config.dry_run, url: str = config.url, apikey: str = config.apikey, queue_size: int = config.queue_size, interval: int = 60) -> None:
     """시리즈 및 볼륨의 커버 이미지가 비정상인 경우 해당 시리즈를 refresh 시도
 
     Args:
         library_id: 라이브러리 ID. 지정하지 않으면 전체 라이브러리
-        covers: 커버 폴더 경로
-        semaphore: 커버 이미지 검증 작업을 동시에 실행할 개수
+        semaphore: 커버 이미지 검증 작업자 및 HTTP 요청을 동시에 실행할 개수
         dry_run: 실제 실행 여부. config.yaml의 값을 기본값으로 사용
         url: 링크 표시용 카비타 URL. conifg.yaml의 값을 기본값으로 사용
         apikey: 카비타 API 키. config.yaml의 값을 기본값으로 사용
+        queue_size: 검증 대기열의 최대 크기. config.yaml의 값을 기본값으로 사용
+        interval: 진행 상황 출력 간격 (초)
     Returns:
         None:
     Examples:
-        >>> scan_no_cover(101, covers='/kavita/config/covers', semaphore=5, url='http://kavita:5000', apikey='abcdefg')
+        >>> scan_no_cover(101, semaphore=5, url='http://kavita:5000', apikey='abcdefg')
     """
     count_query = f'SELECT COUNT(*) AS count FROM Series'
     series_query = f'SELECT Id, CoverImage, LibraryId FROM Series'
@@ -556,28 +1206,29 @@ async def scan_no_cover(library_id: int | None = None, semaphore: int = 10, dry_
         series_query += f' WHERE LibraryId = ?'
     count = fetch_one(count_query, (library_id,) if library_id else ())
     total = int(count['count'])
-    series = fetch_all(series_query, (library_id,)if library_id else ())
+    series = fetch_all_by_keyset(series_query, (library_id,) if library_id else ())
     scan_queue = asyncio.Queue()
-    semaphore = asyncio.Semaphore(semaphore)
-
-    done = 0
-    lock = asyncio.Lock()
-
-    async def wrapped_check(row):
-        nonlocal done
-        async with semaphore:
-            await check_cover_image(row, scan_queue, url=url, apikey=apikey)
-            async with lock:
-                done += 1
-                #if done <= 100 or total - done <= 100 or done % 100 == 0:
-                #    logger.info(f"{done}/{total} checks completed ({done/total*100:.1f}%)")
-                logger.debug(f"{done}/{total} 확인 완료 ({done/total*100:.1f}%)")
-
-    scan_task = asyncio.create_task(series_scan_worker(scan_queue, interval=60, check=5, dry_run=dry_run))
-    check_tasks = [wrapped_check(row) for row in series]
-    await asyncio.gather(*check_tasks)
+    request_semaphore = asyncio.Semaphore(semaphore)
+
+    dispatcher = ScanDispatcher(check=5, url=url, apikey=apikey)
+    scan_task = asyncio.create_task(series_scan_worker(scan_queue, dry_run=dry_run, dispatcher=dispatcher))
+    await queue_task(
+        cover_check_worker,
+        asyncio.Queue(maxsize=max(queue_size, semaphore)),
+        series,
+        scan_queue,
+        request_semaphore,
+        task_size=semaphore,
+        prefix='cover',
+        interval=interval,
+        total=total,
+        url=url,
+        apikey=apikey,
+    )
     await scan_queue.join()
     scan_task.cancel()
+    if not dry_run:
+        logger.info(f'시리즈 스캔 완료: {dispatcher.metrics()}')
 
 
 async def main(*args: Any, **kwds: Any) -> None:
@@ -586,34 +1237,45 @@ async def main(*args: Any, **kwds: Any) -> None:
 
 
 @retrieve_db
-def undo_organized_covers(library_ids: Sequence[int] | str = (), covers: str = '/kavita/config/covers', con: sqlite3.Connection = None) -> None:
+def undo_organized_covers(library_ids: Sequence[int] | str = (), covers: str = '/kavita/config/covers', sub_path: str = None, dry_run: bool = config.dry_run, con: sqlite3.Connection = None) -> None:
+    """라이브러리 폴더로 분산된 커버 파일을 covers 폴더로 되돌리고 CoverImage 값에서 경로를 제거
+    이동에 실패한 파일이 있으면 DB는 변경하지 않음. 원인을 해결한 후 다시 실행
+
+    Args:
+        library_ids: 라이브러리 ID 리스트
+        covers: 커버 폴더 경로
+        sub_path: 커버 폴더 내 하위 폴더 이름
+        dry_run: 실제 실행 여부. config.yaml의 값을 기본값으로 사용
+        con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
+
+    Returns:
+        None:
+
+    Examples:
+        >>> undo_organized_covers([101], '/kavita/config/covers', dry_run=True)
+    """
     path_covers = pathlib.Path(covers)
-    for lib_id in library_ids:
-        path_lib = path_covers / str(lib_id)
+    fails = []
+    for lib_id in parse_ids(library_ids):
+        path_lib = (path_covers / sub_path if sub_path else path_covers) / str(lib_id)
         if not path_lib.exists():
             continue
         for path in path_lib.glob('*'):
             new_path = path_covers / path.name
-            path.rename(new_path)
-            logger.info(new_path)
-
-    query_select = "SELECT Id, CoverImage FROM {table} WHERE CoverImage LIKE ?"
-    query_update = "UPDATE {table} SET CoverImage = ? WHERE Id = ?"
-    finding = '%/%'
-    def update_cover(table: str, row: dict) -> None:
-        try:
-            con.execute(query_update.format(table=table), (f"{row['CoverImage'].split('/')[1]}", row['Id']))
-        except Exception as e:
-            logger.exception(f'{table}: {row["Id"]}')
-    for lib_id in library_ids:
-        lib_row = con.execute(f"{query_select.format(table='Library')} AND Id = ?", (finding, lib_id)).fetchone()
-        update_cover('Library', lib_row)
-        for row in con.execute(f"{query_select.format(table='Series')} AND LibraryId = ?", (finding, lib_id)).fetchall():
-            update_cover('Series', row)
-            for vol_row in con.execute(f"{query_select.format(table='Volume')} AND SeriesId = ?", (finding, row['Id'])).fetchall():
-                update_cover('Volume', vol_row)
-                for ch_row in con.execute(f"{query_select.format(table='Chapter')} AND VolumeId = ?", (finding, vol_row['Id'])).fetchall():
-                    update_cover('Chapter', ch_row)
+            logger.info(f'{path} -> {new_path}')
+            if dry_run:
+                continue
+            try:
+                # sub_path가 리모트 경로(마운트)일 수 있음
+                move_cover(path, new_path)
+            except Exception as e:
+                logger.exception(f'커버 되돌리기 실패: {path}')
+                fails.append((path, str(e)))
+    print_fails(fails)
+    if fails:
+        logger.error(f'이동에 실패한 파일이 있어서 DB를 변경하지 않았습니다: {len(fails)} 개')
+        return
+    rewrite_library_covers(con, library_ids, COVER_BASENAME_SQL, "CoverImage LIKE '%/%'", {}, dry_run=dry_run)
 
 
 if __name__ == '__main__':
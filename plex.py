@@ -1,3 +1,4 @@
+import os
 import re
 import json
 import time
@@ -9,13 +10,13 @@ import logging
 import traceback
 import unicodedata
 import urllib.parse
-from typing import Generator, Sequence
+from typing import Callable, Generator, Sequence
 
 from config import plex as config
-from helpers import run, http_api, retrieve_db
+from helpers import run, http_api, retrieve_db, fetch_by_keyset
 
 logger = logging.getLogger(__name__)
-http_api = http_api(config.headers)
+http_api = http_api(config.headers, service='plex', session_options=config.session)
 retrieve_db = retrieve_db(config.db)
 
 
@@ -69,12 +70,26 @@ def fetch_one(query: str, con: sqlite3.Connection = None) -> dict:
     return con.execute(query).fetchone()
 
 
+@retrieve_db
+def count_all(query: str, con: sqlite3.Connection = None) -> int:
+    query = query.strip().rstrip(';')
+    return con.execute(f'SELECT COUNT(*) AS count FROM ({query})').fetchone()['count']
+
+
 @retrieve_db
 def fetch_all(query: str, con: sqlite3.Connection = None) -> Generator[dict, None, None]:
     for row in con.execute(query):
         yield row
 
 
+def fetch_all_by_keyset(query: str, page_size: int = config.page_size, key: str = 'id') -> Generator[dict, None, None]:
+    """
+    대량의 행을 조회할 때 사용
+    key 컬럼 기준으로 페이지 단위로 나눠서 조회하므로 전체 결과를 메모리에 올리거나 읽기 커서를 오래 유지하지 않음
+    """
+    yield from fetch_by_keyset(config.db, query, page_size=page_size, key=key)
+
+
 @retrieve_db
 def get_metadata_by_id(metadata_id: int, con: sqlite3.Connection = None) -> dict:
     query = f"SELECT * FROM metadata_items WHERE id = ?"
@@ -86,6 +101,77 @@ def get_section_by_id(section_id: int, con: sqlite3.Connection = None) -> dict:
     return con.execute(query, (section_id,)).fetchone()
 
 
+class SectionRegistry:
+    """
+    library_sections, section_locations 테이블을 한번에 불러와서 메모리에 보관
+    섹션 정보는 자주 바뀌지 않으므로 행마다 DB를 조회하지 않도록 사용
+    check_interval 마다 library_sections.updated_at 을 확인해서 변경되었으면 다시 불러옴
+    """
+
+    def __init__(self, check_interval: int | float = 60) -> None:
+        self._sections: dict[int, dict] = {}
+        self._signature: tuple = None
+        self._checked_at = 0.0
+        self._check_interval = check_interval
+
+    @retrieve_db
+    def _get_signature(self, con: sqlite3.Connection = None) -> tuple:
+        row = con.execute("SELECT MAX(updated_at) AS updated_at, COUNT(*) AS count FROM library_sections").fetchone()
+        return row['updated_at'], row['count']
+
+    @retrieve_db
+    def load(self, con: sqlite3.Connection = None) -> None:
+        sections = {}
+        for row in con.execute("SELECT * FROM library_sections"):
+            row['root_paths'] = []
+            sections[row['id']] = row
+        for row in con.execute("SELECT library_section_id, root_path FROM section_locations"):
+            if row.get('root_path') and row['library_section_id'] in sections:
+                sections[row['library_section_id']]['root_paths'].append(row['root_path'])
+        for section in sections.values():
+            section['root_paths'] = tuple(section['root_paths'])
+        self._sections = sections
+        self._signature = self._get_signature()
+        self._checked_at = time.time()
+        logger.debug(f'섹션 정보 불러옴: {len(sections)} 개')
+
+    def invalidate(self) -> None:
+        """다음 조회시 섹션 정보를 다시 불러오도록 설정. DB를 직접 수정한 경우 사용"""
+        self._signature = None
+
+    def refresh(self) -> None:
+        if self._signature is None:
+            self.load()
+        elif time.time() - self._checked_at > self._check_interval:
+            self._checked_at = time.time()
+            if self._get_signature() != self._signature:
+                logger.debug('섹션 정보가 변경됨')
+                self.load()
+
+    def get(self, section_id: int) -> dict | None:
+        self.refresh()
+        return self._sections.get(int(section_id))
+
+    def agent(self, section_id: int) -> str | None:
+        section = self.get(section_id)
+        return section['agent'] if section else None
+
+    def section_type(self, section_id: int) -> int | None:
+        section = self.get(section_id)
+        return section['section_type'] if section else None
+
+    def root_paths(self, section_id: int) -> tuple[str]:
+        section = self.get(section_id)
+        return section['root_paths'] if section else ()
+
+    def all(self) -> tuple[dict]:
+        self.refresh()
+        return tuple(self._sections.values())
+
+
+sections = SectionRegistry()
+
+
 @retrieve_db
 def get_media_parts_by_metadata_id(metadata_id: int, con: sqlite3.Connection = None) -> list:
     query = f"SELECT media_parts.id, media_parts.file FROM media_parts, media_items WHERE media_parts.media_item_id = media_items.id AND media_items.metadata_item_id = ?"
@@ -244,13 +330,16 @@ def get_extra_data_url(extra_data: dict) -> str:
 
 
 @retrieve_db
-async def delete_not_exists(section_id: int, mount_anchor: str, /, dry_run: bool = config.dry_run, print_exists: bool = False, con: sqlite3.Connection = None) -> None:
+async def delete_not_exists(section_id: int, mount_anchor: str, /, dry_run: bool = config.dry_run, print_exists: bool = False, exists: Callable[[str], bool] = os.path.exists, con: sqlite3.Connection = None) -> None:
     """파일이 삭제되었지만 휴지통 비우기로 처리되지 않는 미디어를 DB에서 삭제
     Args:
         section_id: 섹션 아이디. 모든 섹션을 지정하려면 section_id를 -1로 지정
         mount_anchor: mount_anchor로 지정한 경로가 존재할 때만 처리
         dry_run: 실제 실행 여부. 기본값: ``config.yaml``에 정의된 dry_run
         print_exists: 존재하는 파일을 디버그 로그에 출력할 지 여부. 기본값: False
+        exists: 경로의 존재 여부를 확인할 함수. 기본값: os.path.exists. 스레드에서 실행
+            마운트 대신 드라이브 목록으로 확인하려면 ``google_drive.DriveListing().exists``를 지정
+            예외가 발생하면 삭제하지 않고 중단
         con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
 
     Returns:
@@ -277,12 +366,12 @@ async def delete_not_exists(section_id: int, mount_anchor: str, /, dry_run: bool
         if not file:
             continue
         path = pathlib.Path(file)
-        if path.exists():
+        if await asyncio.to_thread(exists, str(path)):
             if print_exists:
                 logger.debug(f"{idx}. {row['meta_id']}: {str(path)}")
             continue
         logger.info(f"{row['meta_id']}: NOT EXISTS: {str(path)}")
-        if not anchor.exists():
+        if not await asyncio.to_thread(exists, str(anchor)):
             logger.debug(f"SKIP: {anchor=} is not exists")
             continue
         if not dry_run:
@@ -293,12 +382,14 @@ async def delete_not_exists(section_id: int, mount_anchor: str, /, dry_run: bool
 
 
 @retrieve_db
-async def prune_directories(library_id: int = -1, mount_anchor: str = None, dry_run: bool = config.dry_run, print_exists: bool = False, con: sqlite3.Connection = None) -> None:
+async def prune_directories(library_id: int = -1, mount_anchor: str = None, dry_run: bool = config.dry_run, print_exists: bool = False, exists: Callable[[str], bool] = os.path.exists, con: sqlite3.Connection = None) -> None:
     """데이터베이스의 directories 테이블에 등록된 경로가 유효한지 검사 후 정리
     Args:
         library_id: 라이브러리 아이디 (모든 라이브러리에 대해서는 -1)
         mount_anchor: mount_anchor로 지정한 경로가 존재할 때만 처리
         dry_run: 실제 적용 여부. 기본값: ``config.yaml``에 정의된 dry_run
+        exists: 경로의 존재 여부를 확인할 함수. 기본값: os.path.exists. 스레드에서 실행
+            예외가 발생하면 정리하지 않고 중단
         con: sqlite3 커넥션. 데코레이터에 의해 자동 입력
     Returns:
         None:
@@ -309,17 +400,11 @@ async def prune_directories(library_id: int = -1, mount_anchor: str = None, dry_
     """
     anchor = pathlib.Path(mount_anchor)
     limit_query = f" WHERE library_section_id = {library_id}"
-    section_query = "SELECT * FROM section_locations"
-    if int(library_id) > 0:
-        section_query += limit_query
-    section_cursor: sqlite3.Cursor = con.execute(section_query)
-    section_locations = {}
-    for row in section_cursor:
-        if not row.get('root_path'):
-            continue
-        section_id = row['library_section_id']
-        section_locations.setdefault(section_id, [])
-        section_locations[section_id].append(pathlib.Path(row['root_path']))
+    section_locations = {
+        section['id']: [pathlib.Path(root_path) for root_path in section['root_paths']]
+        for section in sections.all()
+        if int(library_id) < 1 or section['id'] == int(library_id)
+    }
     directory_query = "SELECT * FROM directories"
     if int(library_id) > 0:
         directory_query += limit_query
@@ -341,13 +426,13 @@ async def prune_directories(library_id: int = -1, mount_anchor: str = None, dry_
             continue
         for root_path in root_paths:
             tmp_path = root_path / row['path']
-            if tmp_path.exists():
+            if await asyncio.to_thread(exists, str(tmp_path)):
                 if print_exists:
                     logger.info(f"유효한 경로: {tmp_path}")
                 break
         else:
             logger.info(f"유효하지 않는 경로: {row}")
-            if not anchor.exists():
+            if not await asyncio.to_thread(exists, str(anchor)):
                 logger.warning(f"다음 경로가 존재하지 않아 건너 뜁니다: {mount_anchor=}")
                 continue
             if row.get('deleted_at'):
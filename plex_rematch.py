@@ -1,13 +1,16 @@
 import sys
+import time
 import asyncio
 import pathlib
 import logging
+import sqlite3
+import functools
 import traceback
 from difflib import SequenceMatcher
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable, Mapping
 
 import plex
-from helpers import queue_task, check_packages
+from helpers import queue_task, check_packages, dict_factory
 from config import plex as config
 
 check_packages((('guessit', 'guessit'),))
@@ -15,10 +18,87 @@ check_packages((('guessit', 'guessit'),))
 from guessit import guessit
 
 logger = logging.getLogger(__name__)
-
 NO_MATCHES = []
 
 
+def init_journal(con: sqlite3.Connection) -> None:
+    """일치항목 수정 결과를 기록하는 저널 테이블 생성"""
+    con.executescript("""
+        CREATE TABLE IF NOT EXISTS rematch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            metadata_id INTEGER NOT NULL,
+            old_guid TEXT,
+            new_guid TEXT,
+            score INTEGER,
+            agent TEXT,
+            outcome TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS rematch_metadata_id ON rematch (metadata_id, id);
+    """)
+
+
+def journal_db(func: Callable) -> Callable:
+    """저널 DB를 연결해서 con 인자로 전달. 연결할 때 테이블이 없으면 생성"""
+    @functools.wraps(func)
+    def wrap(*args: Any, **kwds: Any) -> Any:
+        with sqlite3.connect(config.journal) as con:
+            con.row_factory = dict_factory
+            init_journal(con)
+            return func(*args, con=con, **kwds)
+    return wrap
+
+
+@journal_db
+def record_outcome(row: dict, outcome: str, agent: str = None, sr: dict = None, con: sqlite3.Connection = None) -> None:
+    """
+    outcome
+        matched: 일치항목 수정
+        no_match: 일치하는 검색 결과 없음
+        error: 처리 중 오류 발생
+    """
+    sr = sr or {}
+    con.execute(
+        "INSERT INTO rematch (metadata_id, old_guid, new_guid, score, agent, outcome, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (row['id'], row['guid'], sr.get('guid'), sr.get('score'), agent, outcome, time.time())
+    )
+
+
+@journal_db
+def is_processed(row: dict, con: sqlite3.Connection = None) -> bool:
+    """마지막으로 기록된 결과 이후 guid가 변경되지 않았으면 처리된 것으로 판단. 오류로 기록된 항목은 다시 처리"""
+    last = con.execute(
+        "SELECT old_guid, new_guid, outcome FROM rematch WHERE metadata_id = ? ORDER BY id DESC LIMIT 1",
+        (row['id'],)
+    ).fetchone()
+    if not last or last['outcome'] == 'error':
+        return False
+    guid = last['new_guid'] if last['outcome'] == 'matched' else last['old_guid']
+    return guid == row['guid']
+
+
+@journal_db
+def get_no_matches(since: float = 0, con: sqlite3.Connection = None) -> list[dict]:
+    """마지막 결과가 no_match 인 항목 목록
+    Args:
+        since: 이 시간(unix timestamp) 이후에 기록된 항목만 조회
+
+    Returns:
+        list[dict]: 저널에 기록된 행
+
+    Examples:
+        >>> for row in get_no_matches(): print(row['metadata_id'], row['old_guid'])
+    """
+    query = """
+        SELECT r.*
+        FROM rematch AS r
+        JOIN (SELECT MAX(id) AS id FROM rematch GROUP BY metadata_id) AS l ON r.id = l.id
+        WHERE r.outcome = 'no_match' AND r.created_at >= ?
+        ORDER BY r.id
+    """
+    return con.execute(query, (since,)).fetchall()
+
+
 def get_keyword(guid: str, target_agent: str) -> str | None:
     '''
     plex.agents
@@ -45,7 +125,7 @@ def get_keyword(guid: str, target_agent: str) -> str | None:
 
 def resolve_agent(agent: str, section_id: int) -> str:
     if not agent:
-        agent = plex.get_section_by_id(section_id)['agent']
+        agent = plex.sections.agent(section_id)
     return agent
 
 
@@ -59,7 +139,7 @@ def skip_for_safe(row: dict, agent: str, score: int) -> bool:
     return False
 
 
-async def match_with_guid(row: dict, agent: str) -> bool:
+async def search_with_guid(row: dict, agent: str) -> dict | None:
     if keyword := get_keyword(row['guid'], agent):
         result = await plex.matches(row['id'], keyword, None, agent)
         if 300 > result.get('status_code') > 199 or not result.get('json'):
@@ -68,9 +148,13 @@ async def match_with_guid(row: dict, agent: str) -> bool:
             if search_results:
                 sr = search_results[0]
                 logger.info(f"GUID로 매칭: \"{row['title']}\" ({row['year']}) => name=\"{sr['name']}\" year={sr.get('year')} guid={sr['guid']} score={sr.get('score') or -1}")
-                await plex.rematch(row['id'], sr['guid'], sr['name'], sr.get('year'))
-                return True
-    return False
+                return sr
+
+
+async def match_with_guid(row: dict, agent: str) -> dict | None:
+    if sr := await search_with_guid(row, agent):
+        await apply_match(row, sr)
+        return sr
 
 
 def get_file_info(row: dict) -> tuple[str, int]:
@@ -96,14 +180,26 @@ def get_file_info(row: dict) -> tuple[str, int]:
     return f_title, f_year
 
 
-async def handle_matches(row: dict, agent: str = None, score: int= -1, plex_link: str = config.link) -> bool:
+async def apply_match(row: dict, sr: dict) -> None:
+    logger.info(f"변경: \"{row['title']}\" ({row['year']}) => name=\"{sr['name']}\" year={sr.get('year')} guid={sr['guid']} score={sr.get('score') or -1}")
+    await plex.rematch(row['id'], sr['guid'], sr['name'], sr.get('year'))
+
+
+async def handle_matches(row: dict, agent: str = None, score: int= -1, plex_link: str = config.link) -> dict | None:
+    if sr := await find_match(row, agent, score, plex_link):
+        await apply_match(row, sr)
+        return sr
+
+
+async def find_match(row: dict, agent: str = None, score: int= -1, plex_link: str = config.link) -> dict | None:
+    """검색 결과 중 일치 조건에 맞는 결과를 반환. 일치항목 수정은 하지 않음"""
     agent = resolve_agent(agent, row['library_section_id'])
     if skip_for_safe(row, agent, score):
-        return False
+        return
 
     # 기존 guid에 메타데이터 사이트의 id가 있는지 확인
-    if await match_with_guid(row, agent):
-        return True
+    if sr := await search_with_guid(row, agent):
+        return sr
 
     # 파일명을 우선 검색
     f_title, f_year = get_file_info(row)
@@ -131,13 +227,11 @@ async def handle_matches(row: dict, agent: str = None, score: int= -1, plex_link
             if not is_match_with(row, sr, title_candidates, year, score):
                 continue
             # 최종 변경 대상
-            logger.info(f"변경: \"{title_candidates[0]}\" ({year}) => name=\"{sr['name']}\" year={sr.get('year')} guid={sr['guid']} score={sr.get('score') or -1}")
-            await plex.rematch(row['id'], sr['guid'], sr['name'], sr.get('year'))
-            return True
+            logger.debug(f"일치: \"{title_candidates[0]}\" ({year}) => name=\"{sr['name']}\" year={sr.get('year')} guid={sr['guid']} score={sr.get('score') or -1} agent=\"{agent}\"")
+            return sr
         except:
             logger.error(traceback.format_exc())
-    logger.info(f"일치하는 검색이 없어요: {title_candidates[0]} ({year}) link={plex_link + str(row['id'])}")
-    return False
+    logger.info(f"일치하는 검색이 없어요: {title_candidates[0]} ({year}) agent=\"{agent}\" link={plex_link + str(row['id'])}")
 
 
 def is_match_with(row: dict,
@@ -189,7 +283,9 @@ async def worker(queue: asyncio.Queue,
                  score_min: int = config.score_min,
                  score_min_extra: int = config.score_min_extra,
                  extra_agents: Iterable[str] = config.extra_agents,
-                 plex_media_types: Iterable[str] = config.media_types) -> None:
+                 plex_media_types: Iterable[str] = config.media_types,
+                 rerun: bool = False,
+                 speculative: bool = config.speculative) -> None:
     while True:
         row = await queue.get()
         if row is None:
@@ -199,26 +295,80 @@ async def worker(queue: asyncio.Queue,
         link = plex_link + str(row['id'])
         info = f"id={row['id']} title=\"{row['title']}\" link=\"{link}\""
         logger.debug(f'작업 시작({name}): {info}')
+        agent = None
         try:
             if row['metadata_type'] in (1, 2, 8, 9):
-                result = await handle_matches(row, score=score_min)
-                if not result and extra_agents:
-                    logger.debug(f"다른 에이전트로 시도: {extra_agents[row['metadata_type']]}")
-                    result = await handle_matches(row, agent=extra_agents[row['metadata_type']], score=score_min_extra)
-                if not result:
+                if rerun and is_processed(row):
+                    logger.debug(f'이미 처리된 항목: {info}')
+                    continue
+                agent = resolve_agent(None, row['library_section_id'])
+                extra_agent = extra_agents.get(row['metadata_type']) if extra_agents else None
+                if speculative and extra_agent:
+                    result, agent = await match_speculatively(row, agent, extra_agent, score_min, score_min_extra)
+                else:
+                    result = await handle_matches(row, agent=agent, score=score_min)
+                    if not result and extra_agent:
+                        logger.debug(f"다른 에이전트로 시도: {extra_agent}")
+                        agent = extra_agent
+                        result = await handle_matches(row, agent=agent, score=score_min_extra)
+                if result:
+                    record_outcome(row, 'matched', agent, result)
+                else:
                     NO_MATCHES.append((row['title'], plex_link + str(row['id'])))
+                    record_outcome(row, 'no_match', agent)
             else:
                 logger.warning(f"지원하지 않는 메타데이터 타입: {plex_media_types[row['metadata_type']]}")
+        except Exception:
+            logger.exception(f'작업 실패({name}): {info}')
+            record_outcome(row, 'error', agent)
         finally:
             queue.task_done()
             logger.debug(f'작업 종료({name}): {info}')
 
 
-async def force_match_with_agent(metadata_ids: Iterable, agent: str) -> None:
+async def match_speculatively(row: dict, agent: str, extra_agent: str, score_min: int, score_min_extra: int) -> tuple[dict | None, str]:
+    """
+    기본 에이전트와 extra_agents 검색을 동시에 시작
+    기본 에이전트의 결과를 우선 채택하고 이 경우 extra_agents 검색은 취소
+    """
+    primary = asyncio.create_task(find_match(row, agent=agent, score=score_min))
+    extra = asyncio.create_task(find_match(row, agent=extra_agent, score=score_min_extra))
+    try:
+        if sr := await primary:
+            extra.cancel()
+        elif sr := await extra:
+            agent = extra_agent
+        else:
+            return None, extra_agent
+        await apply_match(row, sr)
+        return sr, agent
+    finally:
+        for task in (primary, extra):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # 채택되지 않은 검색의 예외는 무시
+                task.exception()
+
+
+def swap_agents(agents: Mapping[int, str]) -> None:
+    """여러 섹션의 에이전트를 하나의 트랜잭션으로 변경"""
+    if not agents:
+        return
+    queries = ["UPDATE library_sections SET agent = '" + agent.replace("'", "''") + f"' WHERE id = {int(section_id)}" for section_id, agent in agents.items()]
+    plex.execute(f"BEGIN; {'; '.join(queries)}; COMMIT;")
+    # 에이전트 변경은 updated_at 이 바뀌지 않으므로 섹션 정보를 직접 갱신
+    plex.sections.invalidate()
+    for section_id in agents:
+        logger.debug(f'에이전트: section={section_id} agent={plex.sections.agent(section_id)}')
+
+
+async def force_match_with_agent(metadata_ids: Iterable, agent: str, dry_run: bool = config.dry_run) -> None:
     """기본 에이전트로 설정된 라이브러리에서 타 에이전트로 강제 매칭을 시도. 매칭 후 메타데이터 새로고침을 하면 원래 에이전트의 데이터로 복구 됨.
     Args:
-        metadata_ids: 매칭할 메타데이터 id 목록. 모두 동일한 section의 메타데이터여야 함
+        metadata_ids: 매칭할 메타데이터 id 목록. 여러 section의 메타데이터를 섞어서 지정 가능
         agent: 강제로 매칭할 에이전트
+        dry_run: 실제 실행 여부. dry_run일 경우 에이전트를 변경하지 않고 대상 목록만 출력
 
     Returns:
         None:
@@ -226,46 +376,66 @@ async def force_match_with_agent(metadata_ids: Iterable, agent: str) -> None:
     Examples:
         >>> await force_match_with_agent([104435, 120317], 'com.plexapp.agents.sjva_agent_movie')
     """
-    # metadata_ids 는 모두 동일한 section으로 간주
-    for metadata_id in metadata_ids:
-        metadata = plex.get_metadata_by_id(metadata_id)
-        section = plex.get_section_by_id(metadata.get('library_section_id'))
-        if section:
-            break
-        else:
+    to_be_matched = ",".join(map(str, (int(metadata_id) for metadata_id in metadata_ids)))
+    if not to_be_matched:
+        return
+    groups = {}
+    for row in plex.fetch_all(f'SELECT id, library_section_id FROM metadata_items WHERE id IN ({to_be_matched})'):
+        groups.setdefault(row['library_section_id'], []).append(row['id'])
+    original_agents = {}
+    for section_id, ids in groups.items():
+        section = plex.sections.get(section_id)
+        if not section:
+            logger.error(f'section 을 찾을 수 없습니다: {section_id} {ids}')
             continue
-    else:
-        logger.error(f'section 을 찾을 수 없습니다: {metadata_ids}')
+        original_agents[section['id']] = section['agent']
+        logger.info(f'section={section_id} agent="{section["agent"]}" => "{agent}": {len(ids)} 개')
+    if not original_agents:
+        logger.error(f'section 을 찾을 수 없습니다: {to_be_matched}')
+        return
+    to_be_matched = ",".join(str(metadata_id) for section_id in original_agents for metadata_id in groups[section_id])
+    query = f'SELECT * FROM metadata_items WHERE id IN ({to_be_matched})'
+    if dry_run:
+        await main_(query, dry_run=dry_run)
+        return
     try:
         # 임시로 라이브러리 에이전트를 변경
-        queries = [f"UPDATE library_sections SET agent = '{agent}' WHERE id = {section['id']}"]
-        plex.execute_batch(queries)
-        changed_agent = plex.fetch_one(f"SELECT agent FROM library_sections WHERE id = {section['id']}")
-        logger.debug(f'에이전트 변경: {changed_agent}')
-
-        # rematch
-        to_be_matched = ",".join(map(str, metadata_ids))
-        await main_(f'SELECT * FROM metadata_items WHERE id IN ({to_be_matched})')
+        swap_agents({section_id: agent for section_id in original_agents})
+        # 모든 섹션의 메타데이터를 하나의 작업자 풀에서 rematch
+        await main_(query, dry_run=dry_run)
     except Exception as e:
         logger.exception(repr(e))
     finally:
         # 원래 에이전트로 복구
-        queries = [f"UPDATE library_sections SET agent = '{section['agent']}' WHERE id = {section['id']}"]
-        plex.execute_batch(queries)
-        final_agent = plex.fetch_one(f"SELECT agent FROM library_sections WHERE id = {section['id']}")
-        logger.debug(f'에이전트 복구: {final_agent}')
+        swap_agents(original_agents)
+
 
+async def main_(query: str, dry_run: bool = config.dry_run, worker_size: int = config.workers, plex_link: str = config.link, queue_size: int = config.queue_size, rerun: bool = False) -> None:
+    """쿼리문으로 조회한 메타데이터의 일치항목 수정을 시도. 결과는 저널(config.journal)에 기록
+    Args:
+        query: 쿼리문
+        dry_run: 실제 실행 여부
+        worker_size: 동시 작업 수
+        plex_link: 링크 표시용 Plex URL
+        queue_size: 작업 대기열의 최대 크기
+        rerun: 저널에 기록된 마지막 결과 이후 guid가 변경되지 않은 항목은 건너 뛰기. 중단된 작업을 이어서 할 때 사용
+
+    Returns:
+        None:
 
-async def main_(query: str, dry_run: bool = config.dry_run, worker_size: int = config.workers, plex_link: str = config.link) -> None:
+    Examples:
+        >>> await main_("SELECT * FROM metadata_items WHERE guid LIKE '%sjva_agent://MD%'", dry_run=False, rerun=True)
+    """
     if not dry_run:
-        await queue_task(worker, asyncio.Queue(), plex.fetch_all(query), task_size=worker_size, prefix='rematch')
+        queue = asyncio.Queue(maxsize=max(queue_size, worker_size))
+        await queue_task(worker, queue, plex.fetch_all_by_keyset(query), task_size=worker_size, prefix='rematch', total=plex.count_all(query), rerun=rerun)
         if NO_MATCHES:
             for idx, no_match in enumerate(NO_MATCHES):
                 logger.debug(f'{idx + 1:>03}. {no_match[0]}: {no_match[1]}')
             logger.info(f'\n직접 매치가 필요한 항목들: {len(NO_MATCHES)}\n')
     else:
         counter = 0
-        for row in plex.fetch_all(query):
+        for row in plex.fetch_all_by_keyset(query):
             link = plex_link + str(row['id'])
             logger.debug(f"{row['id']}: {row['title']} ({row['year']}) guid=\"{row['guid']}\" link=\"{link}\"")
             counter += 1